@@ -0,0 +1,12 @@
+"""
+The admin's URLs, included lazily by course_management.urls.
+
+Importing every admin.py and registering its models takes time that API
+requests don't need, so it happens here, the first time a URL under
+/admin/ is resolved or reversed, rather than when the apps load.
+"""
+from django.contrib import admin
+
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
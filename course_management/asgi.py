@@ -2,6 +2,8 @@
 ASGI config for course_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn course_management.asgi:application``)
+for the live event stream at /api/instructor/events/, which WSGI can't serve.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -11,6 +13,10 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from .preload import preload_urlconf
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'course_management.settings')
 
 application = get_asgi_application()
+
+preload_urlconf()
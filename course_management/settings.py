@@ -35,7 +35,9 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt.token_blacklist',
     'corsheaders',  # Add this line
-    'django.contrib.admin',
+    # Without autodiscovery: admin modules load with the admin's URLs, on the
+    # first /admin/ request, instead of at every boot (course_management.admin_urls).
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -46,6 +48,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Add this line
     'django.middleware.security.SecurityMiddleware',
+    'courses.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -143,4 +146,51 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed when available, stock stdlib JSON otherwise.
+    'DEFAULT_RENDERER_CLASSES': [
+        'courses.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'courses.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Sliding-window limits, keyed '<throttle_scope>_<kind>'; see courses.throttling.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_username': '10/5min',
+        'register_ip': '10/hour',
+        'enroll_user': '30/min',
+        'enroll_ip': '120/min',
+    },
+}
+
+# Enrollments and grades of courses that ended this many days ago move to the
+# archive tables (manage.py archive_courses). Point COURSE_ARCHIVE_DATABASE at
+# another DATABASES alias to keep the archive out of the main database.
+COURSE_ARCHIVE_AFTER_DAYS = 365
+COURSE_ARCHIVE_DATABASE = 'default'
+DATABASE_ROUTERS = ['courses.routers.ArchiveRouter']
+
+# "Students also took" lists (courses.recommendations): how many related
+# courses to keep per course, and how many students a pair must share.
+COURSE_RELATED_TOP_K = 10
+COURSE_RELATED_MIN_SHARED = 2
+
+# Fan-out for /api/instructor/events/. The in-memory backend reaches only
+# streams connected to the same process; see courses.events.
+COURSE_EVENTS_BACKEND = 'courses.events.InMemoryBackend'
+
+# Import the URLconf, and with it every view, when wsgi.py or asgi.py load,
+# instead of during the first request. Turn on under `gunicorn --preload`,
+# where the master imports once and forked workers start warm.
+PRELOAD_URLCONF = False
+
+# Throttle counters. The local-memory cache is per process; point this at
+# Redis or Memcached when running more than one worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
 }
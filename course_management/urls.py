@@ -14,9 +14,10 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from courses.auth_views import ThrottledTokenObtainPairView
 
 # Lines 24 and 25 handle JWT (JSON Web Token) authentication:
 #
@@ -27,8 +28,9 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 # This is used when the original access token expires, allowing users to stay logged in without re-entering credentials.
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # A module path rather than admin.site.urls, so the admin loads on first use.
+    path('admin/', ('course_management.admin_urls', 'admin', 'admin')),
     path('api/', include('courses.urls')),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
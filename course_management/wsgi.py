@@ -11,6 +11,10 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from .preload import preload_urlconf
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'course_management.settings')
 
 application = get_wsgi_application()
+
+preload_urlconf()
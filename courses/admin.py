@@ -1,33 +1,158 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 # Register your models here.
-from .models import Course, Enrollment, Grade, Instructor, Lesson
+from .models import (
+    ArchivedEnrollment,
+    ArchivedGrade,
+    Course,
+    Enrollment,
+    Grade,
+    Instructor,
+    Job,
+    Lesson,
+    RelatedCourse,
+    Tombstone,
+)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that trusts PostgreSQL's row estimate instead of running an
+    exact COUNT(*) over an unfiltered table, once that table is large enough
+    for the difference to matter. Filtered changelists are counted exactly.
+    """
+    estimate_threshold = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows: estimated counts
+    and no second COUNT(*) for the unfiltered total.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class CourseIdFilter(admin.SimpleListFilter):
+    """
+    Filter by course id typed into a text box, instead of listing every
+    course in the sidebar.
+    """
+    title = 'course id'
+    parameter_name = 'course_id'
+    course_lookup = 'course_id'
+    template = 'admin/courses/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(**{self.course_lookup: value})
+        return queryset
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['other_params'] = [
+            (name, value) for name, value in changelist.params.items() if name != self.parameter_name
+        ]
+        all_choice['value'] = self.value() or ''
+        yield all_choice
+
+
+class GradeCourseIdFilter(CourseIdFilter):
+    course_lookup = 'enrollment__course_id'
+
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
     list_display = ('title', 'start_date', 'end_date')
     search_fields = ('title', 'description')
+    autocomplete_fields = ('instructor',)
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(LargeTableAdmin):
     list_display = ('student', 'course', 'enrollment_date')
-    list_filter = ('course', 'enrollment_date')
+    list_select_related = ('student', 'course')
+    list_filter = (CourseIdFilter, 'enrollment_date')
     search_fields = ('student__username', 'course__title')
+    autocomplete_fields = ('student', 'course')
 
 @admin.register(Grade)
-class GradeAdmin(admin.ModelAdmin):
+class GradeAdmin(LargeTableAdmin):
     list_display = ('enrollment', 'grade', 'date_received')
-    list_filter = ('date_received',)
+    # Grade.__str__ goes through enrollment.student and enrollment.course.
+    list_select_related = ('enrollment__student', 'enrollment__course')
+    list_filter = (GradeCourseIdFilter, 'date_received')
     search_fields = ('enrollment__student__username', 'enrollment__course__title')
+    autocomplete_fields = ('enrollment',)
 
 @admin.register(Instructor)
 class InstructorAdmin(admin.ModelAdmin):
     list_display = ('user', 'bio')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__first_name', 'user__last_name')
+    autocomplete_fields = ('user',)
 
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
     list_display = ('title', 'course', 'order', 'created_at')
-    list_filter = ('course', 'created_at')
+    list_select_related = ('course',)
+    list_filter = (CourseIdFilter, 'created_at')
     search_fields = ('title', 'content', 'course__title')
     ordering = ('course', 'order')
+    autocomplete_fields = ('course',)
+
+@admin.register(ArchivedEnrollment)
+class ArchivedEnrollmentAdmin(LargeTableAdmin):
+    list_display = ('id', 'student_id', 'course_id', 'enrollment_date', 'grade_count', 'archived_at')
+    list_filter = (CourseIdFilter,)
+    # Users and courses may live in another database than the archive.
+    raw_id_fields = ('student', 'course')
+
+@admin.register(ArchivedGrade)
+class ArchivedGradeAdmin(LargeTableAdmin):
+    list_display = ('id', 'enrollment_id', 'grade', 'date_received')
+    list_filter = (GradeCourseIdFilter,)
+    raw_id_fields = ('enrollment',)
+
+@admin.register(Tombstone)
+class TombstoneAdmin(LargeTableAdmin):
+    list_display = ('model', 'object_id', 'deleted_at')
+    list_filter = ('model', 'deleted_at')
+
+@admin.register(RelatedCourse)
+class RelatedCourseAdmin(LargeTableAdmin):
+    list_display = ('course', 'rank', 'related', 'score', 'shared_students', 'computed_at')
+    list_select_related = ('course', 'related')
+    raw_id_fields = ('course', 'related')
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('name',)
+    readonly_fields = ('locked_by', 'locked_at', 'created_at', 'finished_at', 'traceback')
+    raw_id_fields = ('owner',)
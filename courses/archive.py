@@ -0,0 +1,96 @@
+"""
+Archival of enrollments and grades of long-finished courses.
+
+Enrollments in courses whose end_date is more than COURSE_ARCHIVE_AFTER_DAYS
+in the past move to ArchivedEnrollment / ArchivedGrade. The rows keep their
+ids and grade aggregates. Each batch copies and deletes in one short
+transaction while the moved enrollments stay locked, so the site stays up
+and no grade added meanwhile is lost. A run can stop anywhere. The next run
+picks up what is still in the hot tables, and rows already copied to a
+separate archive database are skipped instead of duplicated.
+
+Read endpoints include archived rows when asked with `?include_archived=1`.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from . import signals
+from .models import ArchivedEnrollment, ArchivedGrade, Enrollment, Grade
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 365
+
+ENROLLMENT_COLUMNS = (
+    'id', 'student_id', 'course_id', 'enrollment_date', 'grade_count', 'grade_sum',
+    'grade_sum_squares', 'grade_min', 'grade_max', 'latest_grade',
+)
+GRADE_COLUMNS = ('id', 'enrollment_id', 'grade', 'date_received')
+
+
+def include_archived(request):
+    return request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+def cutoff_date(days=None):
+    """
+    Courses that ended before this date are archived.
+    """
+    if days is None:
+        days = getattr(settings, 'COURSE_ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+    return timezone.localdate() - timedelta(days=days)
+
+
+def archive_batch(cutoff, batch_size=500):
+    """
+    Move up to `batch_size` enrollments, with their grades, of courses that
+    ended before `cutoff`. Returns the number of enrollments and grades moved.
+    """
+    hot_db = router.db_for_write(Enrollment)
+    archive_db = router.db_for_write(ArchivedEnrollment)
+    with transaction.atomic(using=hot_db), transaction.atomic(using=archive_db):
+        enrollments = list(Enrollment.objects.using(hot_db)
+            .filter(course__end_date__lt=cutoff)
+            .select_for_update(of=('self',))
+            .order_by('pk')
+            .values(*ENROLLMENT_COLUMNS)[:batch_size])
+        if not enrollments:
+            return 0, 0
+        ids = [row['id'] for row in enrollments]
+        grades = list(Grade.objects.using(hot_db).filter(enrollment_id__in=ids).values(*GRADE_COLUMNS))
+
+        ArchivedEnrollment.objects.using(archive_db).bulk_create(
+            [ArchivedEnrollment(**row) for row in enrollments], ignore_conflicts=True,
+        )
+        ArchivedGrade.objects.using(archive_db).bulk_create(
+            [ArchivedGrade(**row) for row in grades], ignore_conflicts=True,
+        )
+        with signals.muted():
+            Grade.objects.using(hot_db).filter(enrollment_id__in=ids).delete()
+            Enrollment.objects.using(hot_db).filter(pk__in=ids).delete()
+    return len(enrollments), len(grades)
+
+
+def archive_finished(batch_size=500, max_batches=None, pause=0, cutoff=None, progress=None):
+    """
+    Archive batch after batch until nothing is left or `max_batches` ran,
+    sleeping `pause` seconds in between to leave the database some room.
+    `progress(enrollments, grades)` is called after every batch.
+    """
+    cutoff = cutoff or cutoff_date()
+    totals = {'enrollments': 0, 'grades': 0, 'batches': 0, 'done': False}
+    while max_batches is None or totals['batches'] < max_batches:
+        enrollments, grades = archive_batch(cutoff, batch_size)
+        if not enrollments:
+            totals['done'] = True
+            break
+        totals['enrollments'] += enrollments
+        totals['grades'] += grades
+        totals['batches'] += 1
+        if progress is not None:
+            progress(enrollments, grades)
+        if pause:
+            time.sleep(pause)
+    return totals
@@ -3,11 +3,15 @@ from rest_framework import status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import UserSerializer, LoginSerializer
+from .throttling import IPThrottle, UsernameThrottle
 
 class RegisterView(APIView):
     authentication_classes = []
     permission_classes = []
+    throttle_classes = [IPThrottle]
+    throttle_scope = 'register'
 
     def post(self, request):
         """
@@ -35,6 +39,8 @@ class RegisterView(APIView):
 class LoginView(APIView):
     authentication_classes = []
     permission_classes = []
+    throttle_classes = [IPThrottle, UsernameThrottle]
+    throttle_scope = 'login'
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -70,6 +76,13 @@ class LoginView(APIView):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """
+    Checks passwords just like LoginView, so it shares its throttles.
+    """
+    throttle_classes = [IPThrottle, UsernameThrottle]
+    throttle_scope = 'login'
+
 class LogoutView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
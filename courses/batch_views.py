@@ -0,0 +1,81 @@
+"""
+Several read requests in one round trip.
+
+`POST /api/batch/` authenticates once, then runs each GET subrequest
+through its regular view as the same user and returns the status and body
+of each. Permissions, filtering and pagination apply as if the subrequest
+had been made on its own. Middleware does not run per subrequest. A
+subrequest that raises is logged and reported as a 500 on its own, without
+failing the rest of the batch.
+"""
+import logging
+from urllib.parse import urlsplit
+
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import permissions
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .serializers import BatchSerializer
+
+logger = logging.getLogger(__name__)
+
+# Headers describing the batch's own body, which subrequests don't have.
+BODY_HEADERS = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'HTTP_CONTENT_ENCODING')
+
+
+def build_subrequest(request, path, query):
+    """
+    A GET for `path` with the batch's headers and, already authenticated,
+    its user.
+    """
+    subrequest = HttpRequest()
+    subrequest.method = 'GET'
+    subrequest.path = subrequest.path_info = path
+    subrequest.META = {key: value for key, value in request.META.items() if key not in BODY_HEADERS}
+    subrequest.META.update(REQUEST_METHOD='GET', PATH_INFO=path, QUERY_STRING=query)
+    subrequest.GET = QueryDict(query)
+    # DRF's Request uses these instead of running the authenticators again.
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    return subrequest
+
+
+def run_subrequest(request, url):
+    parts = urlsplit(url)
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        return {'status': 404, 'body': {'detail': 'Not found.'}}
+    view_class = getattr(match.func, 'cls', None)
+    if match.func is batch or view_class is None or not issubclass(view_class, APIView):
+        # Only API views accept a forced user; the event stream isn't one.
+        return {'status': 400, 'body': {'detail': 'This URL cannot be batched.'}}
+
+    subrequest = build_subrequest(request, parts.path, parts.query)
+    subrequest.resolver_match = match
+    try:
+        response = match.func(subrequest, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception('Batched request to %s failed', parts.path)
+        return {'status': 500, 'body': {'detail': 'A server error occurred.'}}
+    return {'status': response.status_code, 'body': getattr(response, 'data', None)}
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@authentication_classes([JWTAuthentication])
+def batch(request):
+    """
+    Run up to 25 GET requests, given as `{"requests": [{"url": "/api/..."}]}`,
+    and return `{"responses": [{"status": ..., "body": ...}]}` in the same
+    order.
+    """
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response({
+        'responses': [run_subrequest(request, item['url']) for item in serializer.validated_data['requests']],
+    })
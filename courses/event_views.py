@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.response import Response
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.tokens import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from . import events
+from .models import Course
+from .permissions import IsInstructor
+from .renderers import FastJSONRenderer
+
+# Comment lines keep proxies and load balancers from timing out idle streams.
+KEEPALIVE_INTERVAL = 15
+RECONNECT_DELAY_MS = 3000
+
+
+class StreamTicket(Token):
+    """
+    A JWT that opens one event stream. Browsers' EventSource cannot send an
+    Authorization header, so the credential has to go in the URL, where
+    server and proxy logs record it. A ticket found there is useless: it is
+    spent once used, expires after 30 seconds, and isn't an access token.
+    """
+    token_type = 'stream'
+    lifetime = timedelta(seconds=30)
+
+
+def redeem_ticket(raw_ticket):
+    ticket = StreamTicket(raw_ticket)
+    # The cache is shared by all workers when configured as README suggests.
+    if not cache.add(f'stream-ticket:{ticket["jti"]}', True, int(ticket.lifetime.total_seconds())):
+        raise TokenError('Ticket has already been used')
+    return ticket
+
+
+def authenticate(request):
+    """
+    Resolve the user from the JWT in the Authorization header or, since
+    browsers' EventSource cannot send headers, a `ticket` query parameter.
+    """
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is not None:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    raw_ticket = request.GET.get('ticket')
+    if not raw_ticket:
+        return None
+    return authentication.get_user(redeem_ticket(raw_ticket))
+
+
+def get_instructor_courses(request):
+    try:
+        user = authenticate(request)
+    except (AuthenticationFailed, InvalidToken, TokenError) as exc:
+        return None, JsonResponse({'detail': str(exc)}, status=401)
+    if user is None:
+        return None, JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if not hasattr(user, 'instructor'):
+        return None, JsonResponse({'detail': 'Only instructors can access this view.'}, status=403)
+    course_ids = list(Course.objects.filter(instructor=user.instructor).values_list('pk', flat=True))
+    return course_ids, None
+
+
+def format_event(message):
+    return b'event: %s\ndata: %s\n\n' % (message['type'].encode(), FastJSONRenderer().render(message))
+
+
+async def event_stream(course_ids):
+    # Subscribe only once the stream is consumed: a generator that never
+    # starts never runs its `finally`.
+    subscription = events.get_backend().subscribe(events.course_channel(pk) for pk in course_ids)
+    try:
+        yield b'retry: %d\n\n' % RECONNECT_DELAY_MS
+        while True:
+            if subscription.overflowed and subscription.queue.empty():
+                # Events were dropped; the client has to reload its data.
+                yield b'event: overflow\ndata: {}\n\n'
+                return
+            message = await subscription.get(timeout=KEEPALIVE_INTERVAL)
+            yield b': keepalive\n\n' if message is None else format_event(message)
+    finally:
+        subscription.close()
+
+
+@api_view(['POST'])
+@permission_classes([IsInstructor])
+@authentication_classes([JWTAuthentication])
+def instructor_events_ticket(request):
+    """
+    A single-use ticket for opening the event stream from a browser, as
+    `/api/instructor/events/?ticket=...`.
+    """
+    ticket = StreamTicket.for_user(request.user)
+    return Response({'ticket': str(ticket), 'expires_in': int(ticket.lifetime.total_seconds())})
+
+
+@require_GET
+async def instructor_events(request):
+    """
+    Server-sent events for the authenticated instructor's courses:
+    `enrollment.created`, `enrollment.deleted`, `grade.created`,
+    `grade.updated` and `grade.deleted`, each with a JSON payload. Courses
+    created after connecting are picked up on reconnect.
+    """
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up for as long as the client listens.
+        return JsonResponse({'detail': 'Event streams are only served over ASGI.'}, status=501)
+
+    course_ids, error = await sync_to_async(get_instructor_courses)(request)
+    if error is not None:
+        return error
+
+    response = StreamingHttpResponse(event_stream(course_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Tell nginx not to buffer the stream
+    return response
@@ -0,0 +1,123 @@
+"""
+In-process publish/subscribe for live course events.
+
+Signal handlers in `courses.signals` publish enrollment and grade changes
+to a channel per course once their transaction commits. The
+`instructor_events` stream subscribes to the channels of the instructor's
+courses.
+
+The backend is chosen by the COURSE_EVENTS_BACKEND setting. The default
+InMemoryBackend only reaches subscribers in the same process, so run the
+ASGI server with a single worker process. For more processes, use a
+backend with the same `publish` / `subscribe` / `has_subscribers` methods
+that relays through a shared broker.
+"""
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'courses.events.InMemoryBackend'
+
+
+def course_channel(course_id):
+    return f'course:{course_id}'
+
+
+class Subscription:
+    """
+    Messages for one subscriber, delivered on the event loop it was created
+    on. A subscriber that falls `max_pending` messages behind is marked
+    `overflowed` and receives nothing more; it should reconnect and reload.
+    """
+    def __init__(self, backend, channels, loop, max_pending):
+        self.backend = backend
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(max_pending)
+        self.overflowed = False
+
+    def deliver(self, message):
+        # Called from any thread; the queue is only touched on its loop.
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout=None):
+        """
+        Next message, or None after `timeout` seconds without one.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class InMemoryBackend:
+    max_pending = 1000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, channels, loop=None):
+        subscription = Subscription(self, channels, loop or asyncio.get_running_loop(), self.max_pending)
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscriptions[channel]
+
+    def has_subscribers(self, channel=None):
+        """
+        Whether anyone listens on `channel`, or on any channel at all.
+        """
+        if channel is None:
+            return bool(self.subscriptions)
+        return channel in self.subscriptions
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscribers = list(self.subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(message)
+            except RuntimeError:
+                # The subscriber's loop has shut down without unsubscribing.
+                logger.warning('Dropping event for closed subscriber on %s', channel)
+                self.unsubscribe(subscription)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(getattr(settings, 'COURSE_EVENTS_BACKEND', DEFAULT_BACKEND))()
+
+
+@receiver(setting_changed)
+def reset_backend(*, setting, **kwargs):
+    if setting == 'COURSE_EVENTS_BACKEND':
+        get_backend.cache_clear()
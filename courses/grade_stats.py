@@ -0,0 +1,88 @@
+"""
+Running grade aggregates stored on each Enrollment.
+
+Adding a grade is a single UPDATE of counters. Changing or removing one
+adjusts the counters and re-reads min, max and latest from that
+enrollment's own grades in the same statement, since those cannot be
+un-applied. Every function issues one UPDATE, so concurrent writers never
+lose each other's changes.
+"""
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import Enrollment, Grade
+
+
+def _grades():
+    return Grade.objects.filter(enrollment=OuterRef('pk'))
+
+
+def _first(queryset, field):
+    return Subquery(queryset.values(field)[:1], output_field=FloatField())
+
+
+def _extremes():
+    return {
+        'grade_min': _first(_grades().order_by('grade'), 'grade'),
+        'grade_max': _first(_grades().order_by('-grade'), 'grade'),
+        'latest_grade': _first(_grades().order_by('-date_received', '-id'), 'grade'),
+    }
+
+
+def grade_added(enrollment_id, value, is_new=True):
+    """
+    Account for a grade that now belongs to the enrollment. `is_new` is
+    False for a grade moved over from another enrollment, which is not
+    necessarily the most recent one.
+    """
+    value = Value(float(value), output_field=FloatField())
+    counters = {
+        'grade_count': F('grade_count') + 1,
+        'grade_sum': F('grade_sum') + value,
+        'grade_sum_squares': F('grade_sum_squares') + value * value,
+    }
+    if is_new:
+        Enrollment.objects.filter(pk=enrollment_id).update(
+            **counters,
+            grade_min=Least(Coalesce('grade_min', value), value),
+            grade_max=Greatest(Coalesce('grade_max', value), value),
+            latest_grade=value,
+        )
+    else:
+        Enrollment.objects.filter(pk=enrollment_id).update(**counters, **_extremes())
+
+
+def grade_changed(enrollment_id, old, new):
+    old, new = float(old), float(new)
+    Enrollment.objects.filter(pk=enrollment_id).update(
+        grade_sum=F('grade_sum') + (new - old),
+        grade_sum_squares=F('grade_sum_squares') + (new * new - old * old),
+        **_extremes(),
+    )
+
+
+def grade_removed(enrollment_id, value):
+    value = float(value)
+    Enrollment.objects.filter(pk=enrollment_id).update(
+        grade_count=F('grade_count') - 1,
+        grade_sum=F('grade_sum') - value,
+        grade_sum_squares=F('grade_sum_squares') - value * value,
+        **_extremes(),
+    )
+
+
+def recompute(enrollments=None):
+    """
+    Rebuild the aggregates from scratch, for rows written around the ORM
+    (bulk_create, QuerySet.update, raw SQL).
+    """
+    enrollments = Enrollment.objects.all() if enrollments is None else enrollments
+    totals = _grades().order_by().values('enrollment')
+    enrollments.update(
+        grade_count=Coalesce(Subquery(totals.annotate(n=Count('id')).values('n')), 0),
+        grade_sum=Coalesce(Subquery(totals.annotate(s=Sum('grade')).values('s')), 0.0),
+        grade_sum_squares=Coalesce(
+            Subquery(totals.annotate(s=Sum(F('grade') * F('grade'))).values('s')), 0.0,
+        ),
+        **_extremes(),
+    )
@@ -0,0 +1,230 @@
+"""
+A small database-backed job queue.
+
+Tasks are plain functions registered with `@job`; `enqueue()` stores a `Job`
+row and `manage.py run_workers` claims and runs due jobs. Claiming uses
+`SELECT ... FOR UPDATE SKIP LOCKED` where the database supports it, and a
+compare-and-swap UPDATE per job otherwise (SQLite). Failed jobs are retried
+with exponential backoff until `max_attempts` is reached. Jobs whose worker
+died are reclaimed once their lock is older than `LOCK_TIMEOUT`, or marked
+failed if that was their last attempt. Live workers keep refreshing the lock
+of the jobs they hold, however long those run.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from importlib import import_module
+
+from django.db import connections, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = timedelta(minutes=10)
+# Claimed jobs refresh their lock this often, so only dead workers' jobs
+# ever get older than LOCK_TIMEOUT.
+HEARTBEAT_INTERVAL = LOCK_TIMEOUT / 4
+RETRY_BACKOFF = timedelta(seconds=10)
+RETRY_BACKOFF_MAX = timedelta(hours=1)
+
+# Modules whose import registers tasks.
+TASK_MODULES = ['courses.tasks']
+
+registry = {}
+
+
+def job(name=None, max_attempts=5):
+    """
+    Register a function as a task. The function is called with the job's
+    payload as keyword arguments and may return any JSON-serializable value,
+    which is stored as the job's result.
+    """
+    def decorator(func):
+        task_name = name or func.__name__
+        registry[task_name] = func
+
+        def enqueue_task(owner=None, run_at=None, **payload):
+            return enqueue(task_name, payload, owner=owner, run_at=run_at, max_attempts=max_attempts)
+
+        func.task_name = task_name
+        func.enqueue = enqueue_task
+        return func
+    return decorator
+
+
+def autodiscover():
+    for module in TASK_MODULES:
+        import_module(module)
+
+
+def get_task(name):
+    if name not in registry:
+        autodiscover()
+    return registry[name]
+
+
+def enqueue(name, payload=None, owner=None, run_at=None, max_attempts=5):
+    get_task(name)  # Fail at enqueue time, not in the worker, for unknown tasks.
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        owner=owner,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_BACKOFF * 2 ** (attempts - 1), RETRY_BACKOFF_MAX)
+
+
+def claim_jobs(worker_id, limit=1):
+    """
+    Atomically mark up to `limit` due jobs as running by `worker_id` and
+    return them.
+    """
+    now = timezone.now()
+    stale = Q(status=Job.RUNNING, locked_at__lt=now - LOCK_TIMEOUT)
+    # A job whose worker died on its last attempt (killed, out of memory)
+    # would take the next worker down with it; give up on it instead.
+    Job.objects.filter(stale, attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, locked_by='',
+        last_error='The worker running the last attempt stopped responding.',
+    )
+    due = (Job.objects
+        .filter(Q(status=Job.QUEUED, run_at__lte=now) | (stale & Q(attempts__lt=F('max_attempts'))))
+        .order_by('run_at', 'id'))
+    claim = dict(status=Job.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1)
+
+    if connections[due.db].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=due.db):
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(pk__in=ids).update(**claim)
+    else:
+        # No row locks: claim candidates one by one, only if nobody else
+        # changed them since we read them.
+        ids = []
+        for candidate in due.values('id', 'status', 'locked_at')[:limit * 4]:
+            if Job.objects.filter(**candidate).update(**claim):
+                ids.append(candidate['id'])
+                if len(ids) == limit:
+                    break
+    return list(Job.objects.filter(pk__in=ids).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome. Returns True on success.
+    """
+    mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by, status=Job.RUNNING)
+    try:
+        result = get_task(job.name)(**job.payload)
+    except Exception as exc:
+        logger.exception('Job %s failed (attempt %d of %d)', job, job.attempts, job.max_attempts)
+        error = dict(last_error=''.join(traceback.format_exception_only(exc)).strip(),
+                     traceback=traceback.format_exc())
+        if job.attempts >= job.max_attempts:
+            mine.update(status=Job.FAILED, finished_at=timezone.now(), locked_by='', **error)
+        else:
+            mine.update(
+                status=Job.QUEUED, locked_by='', locked_at=None, **error,
+                run_at=timezone.now() + retry_delay(job.attempts),
+            )
+        return False
+    mine.update(status=Job.SUCCEEDED, result=result, finished_at=timezone.now(), locked_by='')
+    return True
+
+
+class Heartbeat(threading.Thread):
+    """
+    Refreshes the lock of `jobs` claimed by one worker while they wait and
+    run, so a job outliving LOCK_TIMEOUT isn't reclaimed and run twice. Use
+    as a context manager around running them.
+    """
+    def __init__(self, jobs, interval=None):
+        super().__init__(daemon=True)
+        self.ids = [job.pk for job in jobs]
+        self.worker_ids = {job.locked_by for job in jobs}
+        self.interval = (interval or HEARTBEAT_INTERVAL).total_seconds()
+        self.stopped = threading.Event()
+
+    def run(self):
+        mine = Job.objects.filter(pk__in=self.ids, locked_by__in=self.worker_ids, status=Job.RUNNING)
+        try:
+            while not self.stopped.wait(self.interval):
+                if not mine.update(locked_at=timezone.now()):
+                    return
+        finally:
+            connections.close_all()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.join()
+
+
+class Worker:
+    """
+    Claims and runs jobs in a loop until `stop_event` is set. With
+    `once=True` it returns as soon as no job is due.
+    """
+    def __init__(self, stop_event, poll_interval=1.0, batch_size=1, once=False, name=None):
+        self.stop_event = stop_event
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.once = once
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+    def run_once(self):
+        """
+        Claim and run one batch of due jobs; returns how many were claimed.
+        """
+        jobs = claim_jobs(self.name, self.batch_size)
+        if jobs:
+            with Heartbeat(jobs):
+                for claimed in jobs:
+                    run_job(claimed)
+        return len(jobs)
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                if not self.run_once():
+                    if self.once:
+                        return
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            connections.close_all()
+
+
+def run_threads(stop_event, threads=1, **worker_options):
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+    workers = [
+        threading.Thread(target=Worker(stop_event, name=f'{prefix}:{i}', **worker_options).run)
+        for i in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+
+def run_worker_process(stop_event, threads, worker_options):
+    """
+    Entry point of a forked worker process. The parent handles Ctrl-C and
+    SIGTERM by setting `stop_event`; running jobs are allowed to finish.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    run_threads(stop_event, threads, **worker_options)
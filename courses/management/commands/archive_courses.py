@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from courses.archive import archive_finished, cutoff_date
+
+
+class Command(BaseCommand):
+    help = 'Move enrollments and grades of long-finished courses into the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive courses that ended more than this many days ago '
+                                 '(default: COURSE_ARCHIVE_AFTER_DAYS).')
+        parser.add_argument('--batch-size', type=int, default=500, help='Enrollments moved per transaction.')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches.')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        cutoff = cutoff_date(options['days'])
+        self.stdout.write(f'Archiving courses that ended before {cutoff}')
+
+        def progress(enrollments, grades):
+            self.stdout.write(f'  moved {enrollments} enrollment(s), {grades} grade(s)')
+
+        totals = archive_finished(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            pause=options['pause'],
+            cutoff=cutoff,
+            progress=progress,
+        )
+        state = 'done' if totals['done'] else 'stopped early; run again to continue'
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {totals['enrollments']} enrollment(s) and {totals['grades']} grade(s) "
+            f"in {totals['batches']} batch(es), {state}"
+        ))
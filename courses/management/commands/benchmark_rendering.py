@@ -0,0 +1,101 @@
+import gzip
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from rest_framework.renderers import JSONRenderer
+
+from courses.middleware import brotli, compress_br
+from courses.models import Course, Lesson
+from courses.renderers import FastJSONRenderer
+from courses.serializers import CourseSerializer
+from courses.values_serializers import CourseValuesSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark serialization, JSON render time and bytes sent for /api/courses/ on a synthetic catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=10000)
+        parser.add_argument('--lessons', type=int, default=3, help='Lessons per course.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Everything runs inside a transaction that is rolled back at the end,
+        # so the benchmark never leaves rows behind.
+        try:
+            with transaction.atomic():
+                self.seed(options['courses'], options['lessons'])
+                self.run(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, n_courses, n_lessons):
+        start = date(2024, 9, 1)
+        courses = Course.objects.bulk_create([
+            Course(
+                title=f'Course {i}',
+                description='An introductory course covering the fundamentals. ' * 4,
+                start_date=start + timedelta(days=i % 90),
+                end_date=start + timedelta(days=i % 90 + 120),
+            ) for i in range(n_courses)
+        ], batch_size=1000)
+        Lesson.objects.bulk_create([
+            Lesson(course=course, title=f'Lesson {j}', content='Reading and exercises. ' * 8, order=j)
+            for course in courses for j in range(n_lessons)
+        ], batch_size=1000)
+
+    def run(self, repeat):
+        queryset = Course.objects.select_related('instructor__user').prefetch_related('lessons')
+
+        self.stdout.write('Serialize (best of 3):')
+        for name, serialize in (
+            ('CourseSerializer', lambda: CourseSerializer(queryset.all(), many=True, context={}).data),
+            ('CourseValuesSerializer', lambda: CourseValuesSerializer().to_representation(Course.objects.all())),
+        ):
+            timings = []
+            for _ in range(3):
+                started = time.perf_counter()
+                data = serialize()
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(f'  {name:<22} {min(timings) * 1000:9.1f} ms')
+
+        self.stdout.write(f'Render ({repeat} runs, best):')
+        baseline = None
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                content = renderer.render(data)
+                timings.append(time.perf_counter() - started)
+            baseline = baseline or content
+            self.stdout.write(
+                f'  {type(renderer).__name__:<22} {min(timings) * 1000:9.1f} ms  '
+                f'{len(content):>10} bytes  identical={content == baseline}'
+            )
+
+        self.stdout.write('Compressed size of the rendered payload:')
+        self.stdout.write(f'  {"identity":<22} {len(baseline):>10} bytes')
+        self.stdout.write(f'  {"gzip":<22} {len(gzip.compress(baseline, 6)):>10} bytes')
+        if brotli is not None:
+            self.stdout.write(f'  {"br":<22} {len(compress_br(baseline)):>10} bytes')
+
+        self.stdout.write('GET /api/courses/ end to end:')
+        client = Client(HTTP_HOST='localhost')
+        for encoding in ('identity', 'gzip', 'br'):
+            if encoding == 'br' and brotli is None:
+                continue
+            started = time.perf_counter()
+            response = client.get('/api/courses/', HTTP_ACCEPT_ENCODING=encoding)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'  {encoding:<22} {elapsed * 1000:9.1f} ms  {len(response.content):>10} bytes  '
+                f'Content-Encoding={response.get("Content-Encoding", "-")}'
+            )
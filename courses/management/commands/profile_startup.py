@@ -0,0 +1,117 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Each measurement runs in a fresh interpreter so nothing is already imported.
+WSGI_PROBE = '''
+import io, json, os, sys, time
+started = time.perf_counter()
+from course_management.wsgi import application
+imported = time.perf_counter()
+status = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+    'SERVER_NAME': sys.argv[2], 'SERVER_PORT': '80', 'HTTP_HOST': sys.argv[2],
+    'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+    'wsgi.errors': sys.stderr, 'wsgi.multithread': False, 'wsgi.multiprocess': True,
+}
+response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+b''.join(response)
+finished = time.perf_counter()
+print(json.dumps({'import': imported - started, 'request': finished - imported, 'status': status[0]}))
+'''
+
+ASGI_PROBE = '''
+import asyncio, json, sys, time
+started = time.perf_counter()
+from course_management.asgi import application
+imported = time.perf_counter()
+status = []
+messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+scope = {
+    'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+    'scheme': 'http', 'path': sys.argv[1], 'raw_path': sys.argv[1].encode(), 'query_string': b'',
+    'headers': [(b'host', sys.argv[2].encode())], 'server': (sys.argv[2], 80), 'client': ('127.0.0.1', 0),
+}
+async def receive():
+    if messages:
+        return messages.pop()
+    await asyncio.Future()  # The client never disconnects.
+async def send(message):
+    if message['type'] == 'http.response.start':
+        status.append(message['status'])
+asyncio.run(application(scope, receive, send))
+finished = time.perf_counter()
+print(json.dumps({'import': imported - started, 'request': finished - imported, 'status': status[0]}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure worker cold start: import time per module and time to first response '
+        'through course_management.wsgi and course_management.asgi.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/', help='Path requested as the first response.')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement.')
+        parser.add_argument('--top', type=int, default=20, help='Modules listed in the import profile.')
+        parser.add_argument(
+            '--budget-ms', type=float,
+            help='Fail when the median import + first response time exceeds this budget.',
+        )
+
+    def handle(self, *args, **options):
+        self.report_imports(options['top'], options['path'], options['host'])
+
+        over_budget = []
+        self.stdout.write('Time to first response (median of %d):' % options['runs'])
+        for name, probe in (('wsgi', WSGI_PROBE), ('asgi', ASGI_PROBE)):
+            samples = [self.probe(probe, options['path'], options['host']) for _ in range(options['runs'])]
+            imported = statistics.median(s['import'] for s in samples) * 1000
+            request = statistics.median(s['request'] for s in samples) * 1000
+            total = statistics.median(s['import'] + s['request'] for s in samples) * 1000
+            self.stdout.write(
+                f'  {name}  import {imported:7.1f} ms  first response {request:7.1f} ms  '
+                f'total {total:7.1f} ms  ({str(samples[0]["status"]).split()[0]})'
+            )
+            if options['budget_ms'] is not None and total > options['budget_ms']:
+                over_budget.append(f'{name} {total:.0f} ms')
+
+        if over_budget:
+            raise CommandError(
+                'Startup budget of %d ms exceeded: %s' % (options['budget_ms'], ', '.join(over_budget))
+            )
+
+    def run_python(self, *args):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'course_management.settings',
+        ))
+        return subprocess.run(
+            [sys.executable, *args], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        )
+
+    def probe(self, source, path, host):
+        result = self.run_python('-c', source, path, host)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def report_imports(self, top, path, host):
+        result = self.run_python('-X', 'importtime', '-c', WSGI_PROBE, path, host)
+        modules = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            own, cumulative, name = line[len('import time:'):].split('|')
+            modules.append((int(own), int(cumulative), name.strip()))
+
+        self.stdout.write(f'Slowest imports by self time (of {len(modules)} modules, '
+                          f'{sum(m[0] for m in modules) / 1000:.1f} ms total):')
+        for own, cumulative, name in sorted(modules, reverse=True)[:top]:
+            self.stdout.write(f'  {own / 1000:7.1f} ms  {cumulative / 1000:7.1f} ms cumulative  {name}')
@@ -0,0 +1,24 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.recommendations import refresh
+
+
+class Command(BaseCommand):
+    help = 'Recompute the "students also took" lists of related courses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=int, nargs='+', default=None,
+                            help='Only recompute these courses (default: all).')
+        parser.add_argument('--top-k', type=int, default=None,
+                            help='Related courses kept per course (default: COURSE_RELATED_TOP_K).')
+        parser.add_argument('--min-shared', type=int, default=None,
+                            help='Students a pair of courses must share '
+                                 '(default: COURSE_RELATED_MIN_SHARED).')
+
+    def handle(self, *args, **options):
+        try:
+            updated = refresh(options['ids'], top_k=options['top_k'], min_shared=options['min_shared'])
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Updated the related courses of {updated} course(s)'))
@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.models import Course
+from courses.rollover import DateOutOfRange, rollover, shift_to_start
+
+
+class Command(BaseCommand):
+    help = 'Copy courses with all their lessons into a new term.'
+
+    def add_arguments(self, parser):
+        selection = parser.add_argument_group('courses to copy (combined with AND)')
+        selection.add_argument('--ids', type=int, nargs='+', help='Course ids.')
+        selection.add_argument('--term-start', type=date.fromisoformat,
+                               help='Courses starting on or after this date (YYYY-MM-DD).')
+        selection.add_argument('--term-end', type=date.fromisoformat,
+                               help='Courses starting on or before this date (YYYY-MM-DD).')
+        selection.add_argument('--instructor', help="Username of the courses' instructor.")
+
+        shift = parser.add_mutually_exclusive_group(required=True)
+        shift.add_argument('--shift-days', type=int, help='Move both dates by this many days.')
+        shift.add_argument('--new-start', type=date.fromisoformat,
+                           help='Move dates so the earliest selected course starts on this date.')
+
+        parser.add_argument('--batch-size', type=int, default=500, help='Courses copied per batch.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be copied.')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options['ids']:
+            courses = courses.filter(pk__in=options['ids'])
+        if options['term_start']:
+            courses = courses.filter(start_date__gte=options['term_start'])
+        if options['term_end']:
+            courses = courses.filter(start_date__lte=options['term_end'])
+        if options['instructor']:
+            courses = courses.filter(instructor__user__username=options['instructor'])
+        if not any(options[name] for name in ('ids', 'term_start', 'term_end', 'instructor')):
+            raise CommandError('Select courses with --ids, --term-start, --term-end or --instructor.')
+
+        if options['new_start']:
+            shift = shift_to_start(courses, options['new_start'])
+        else:
+            try:
+                shift = timedelta(days=options['shift_days'])
+            except OverflowError:
+                raise CommandError('--shift-days is out of range.')
+
+        if options['dry_run']:
+            self.stdout.write(f'Would copy {courses.count()} course(s), shifting dates by {shift.days} day(s)')
+            return
+
+        try:
+            mapping, lesson_count = rollover(courses, shift, batch_size=options['batch_size'])
+        except DateOutOfRange as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f'Copied {len(mapping)} course(s) and {lesson_count} lesson(s)'
+        ))
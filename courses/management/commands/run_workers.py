@@ -0,0 +1,62 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from courses.jobs import autodiscover, run_threads, run_worker_process
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers: a pool of processes, each running a pool of threads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes. With 1, threads run in this process.')
+        parser.add_argument('--threads', type=int, default=4, help='Worker threads per process.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait before polling again when no job is due.')
+        parser.add_argument('--batch-size', type=int, default=1, help='Jobs claimed per poll.')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due.')
+
+    def handle(self, *args, **options):
+        # Register every task before forking so children inherit the registry.
+        autodiscover()
+
+        worker_options = {
+            'poll_interval': options['poll_interval'],
+            'batch_size': options['batch_size'],
+            'once': options['once'],
+        }
+        self.stdout.write(
+            f"Starting {options['processes']} process(es) x {options['threads']} thread(s)"
+        )
+
+        if options['processes'] <= 1:
+            stop_event = threading.Event()
+            self.handle_signals(stop_event)
+            run_threads(stop_event, options['threads'], **worker_options)
+            return
+
+        stop_event = multiprocessing.Event()
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=run_worker_process, args=(stop_event, options['threads'], worker_options),
+            )
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.handle_signals(stop_event)
+        for process in processes:
+            process.join()
+
+    def handle_signals(self, stop_event):
+        def stop(signum, frame):
+            self.stdout.write('Stopping after running jobs finish...')
+            stop_event.set()
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
@@ -0,0 +1,144 @@
+try:
+    import brotli
+except ImportError:  # pragma: no cover - exercised only without the optional dependency
+    brotli = None
+
+import secrets
+from gzip import GzipFile
+
+from django.middleware.gzip import GZipMiddleware, re_accepts_gzip
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import StreamingBuffer, compress_string
+
+re_accepts_br = _lazy_re_compile(r'\bbr\b(?!\s*;\s*q=0(?:\.0*)?\s*(?:,|$))')
+
+# Event streams must reach the client chunk by chunk; compressing them would
+# make proxies and browsers buffer until the compressor flushes.
+UNCOMPRESSED_CONTENT_TYPES = ('text/event-stream',)
+
+
+def compress_br(data, quality=5):
+    return brotli.compress(data, quality=quality)
+
+
+def compress_br_sequence(sequence, quality=5):
+    compressor = brotli.Compressor(quality=quality)
+    for item in sequence:
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_br_sequence(sequence, quality=5):
+    compressor = brotli.Compressor(quality=quality)
+    async for item in sequence:
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def gzip_stream(max_random_bytes):
+    # A random-length filename in the header, as in Django's compress_sequence.
+    buffer = StreamingBuffer()
+    filename = b'a' * secrets.randbelow(max_random_bytes) if max_random_bytes else None
+    return buffer, GzipFile(filename=filename, mode='wb', compresslevel=6, fileobj=buffer, mtime=0)
+
+
+def compress_gzip_sequence(sequence, max_random_bytes=None):
+    """
+    django.utils.text.compress_sequence, but flushing after every chunk.
+    """
+    buffer, zfile = gzip_stream(max_random_bytes)
+    with zfile:
+        for item in sequence:
+            zfile.write(item)
+            zfile.flush()
+            yield buffer.read()
+    yield buffer.read()
+
+
+async def acompress_gzip_sequence(sequence, max_random_bytes=None):
+    buffer, zfile = gzip_stream(max_random_bytes)
+    with zfile:
+        async for item in sequence:
+            zfile.write(item)
+            zfile.flush()
+            yield buffer.read()
+    yield buffer.read()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Negotiated response compression: brotli when the client accepts it and
+    the `brotli` package is installed, gzip otherwise.
+
+    Streaming responses (sync and async) are compressed incrementally and
+    every chunk is flushed, so clients still receive data as it is produced.
+
+    Against BREACH, gzip output carries a random-length filename like
+    Django's GZipMiddleware does. Brotli has no such field, so requests with
+    cookies, which may carry a session that a cross-site page could replay,
+    always get gzip. Requests without cookies authenticate with a bearer
+    token that another site cannot make the browser send. Since the choice
+    then depends on cookies, such responses vary on Cookie too, so a shared
+    cache never serves the brotli variant to a request with cookies.
+    """
+    brotli_quality = 5
+
+    def accepts_br(self, request):
+        return brotli is not None and re_accepts_br.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+    def select_encoding(self, request):
+        if self.accepts_br(request) and not request.COOKIES:
+            return 'br'
+        if re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return 'gzip'
+        return None
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').split(';')[0].strip() in UNCOMPRESSED_CONTENT_TYPES:
+            return response
+
+        # It's not worth attempting to compress really short responses.
+        if not response.streaming and len(response.content) < 200:
+            return response
+
+        # Avoid compressing if we've already got a content-encoding.
+        if response.has_header('Content-Encoding'):
+            return response
+
+        vary = ('Accept-Encoding', 'Cookie') if self.accepts_br(request) else ('Accept-Encoding',)
+        patch_vary_headers(response, vary)
+
+        encoding = self.select_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                compress = acompress_br_sequence if response.is_async else compress_br_sequence
+                option = self.brotli_quality
+            else:
+                compress = acompress_gzip_sequence if response.is_async else compress_gzip_sequence
+                option = self.max_random_bytes
+            response.streaming_content = compress(response.streaming_content, option)
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed_content = compress_br(response.content, self.brotli_quality)
+            else:
+                compressed_content = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+
+        return response
@@ -0,0 +1,65 @@
+# Generated by Django 5.1 on 2026-10-19 11:05
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_grade_stats(apps, schema_editor):
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    Grade = apps.get_model('courses', 'Grade')
+    grades = Grade.objects.filter(enrollment=OuterRef('pk'))
+    totals = grades.order_by().values('enrollment')
+
+    def first(queryset):
+        return Subquery(queryset.values('grade')[:1], output_field=FloatField())
+
+    Enrollment.objects.update(
+        grade_count=Coalesce(Subquery(totals.annotate(n=Count('id')).values('n')), 0),
+        grade_sum=Coalesce(Subquery(totals.annotate(s=Sum('grade')).values('s')), 0.0),
+        grade_sum_squares=Coalesce(Subquery(totals.annotate(s=Sum(F('grade') * F('grade'))).values('s')), 0.0),
+        grade_min=first(grades.order_by('grade')),
+        grade_max=first(grades.order_by('-grade')),
+        latest_grade=first(grades.order_by('-date_received', '-id')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='grade_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='grade_max',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='grade_min',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='grade_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='grade_sum_squares',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='latest_grade',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_grade_stats, migrations.RunPython.noop),
+    ]
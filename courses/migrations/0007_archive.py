@@ -0,0 +1,42 @@
+# Generated by Django 5.1 on 2026-10-19 11:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_sync_tombstones'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEnrollment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('enrollment_date', models.DateField()),
+                ('grade_count', models.PositiveIntegerField(default=0)),
+                ('grade_sum', models.FloatField(default=0)),
+                ('grade_sum_squares', models.FloatField(default=0)),
+                ('grade_min', models.FloatField(blank=True, null=True)),
+                ('grade_max', models.FloatField(blank=True, null=True)),
+                ('latest_grade', models.FloatField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('course', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='courses.course')),
+                ('student', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedGrade',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('grade', models.FloatField()),
+                ('date_received', models.DateField()),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grades', to='courses.archivedenrollment')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-19 11:43
+
+from django.db import migrations, models
+
+
+def split_tracebacks(apps, schema_editor):
+    # last_error used to hold the whole traceback; keep only its last line.
+    Job = apps.get_model('courses', 'Job')
+    for job in Job.objects.filter(last_error__startswith='Traceback').only('last_error').iterator():
+        job.traceback = job.last_error
+        job.last_error = job.last_error.strip().splitlines()[-1]
+        job.save(update_fields=['last_error', 'traceback'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_related_course'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='traceback',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(split_tracebacks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from rest_framework.response import Response
+
+
+class ValuesListMixin:
+    """
+    Serve `list` through a `.values()` backed serializer instead of the
+    viewset's ModelSerializer. The output is identical; see
+    `courses.values_serializers`.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            # Paginators hand back model instances, not rows.
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.values_serializer_class(context=self.get_serializer_context())
+        return Response(serializer.to_representation(queryset))
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # Create your models here.
 class Instructor(models.Model):
@@ -15,6 +16,7 @@ class Course(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     instructor = models.ForeignKey(Instructor, on_delete=models.SET_NULL, null=True, related_name='courses')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Drives delta sync, see courses.sync
     
     def __str__(self):
         return self.title
@@ -23,6 +25,14 @@ class Enrollment(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
     enrollment_date = models.DateField(auto_now_add=True)
+    # Running aggregates over this enrollment's grades, kept up to date by
+    # courses.signals so transcripts never scan Grade (see courses.grade_stats).
+    grade_count = models.PositiveIntegerField(default=0)
+    grade_sum = models.FloatField(default=0)
+    grade_sum_squares = models.FloatField(default=0)
+    grade_min = models.FloatField(null=True, blank=True)
+    grade_max = models.FloatField(null=True, blank=True)
+    latest_grade = models.FloatField(null=True, blank=True)
 
     class Meta:
         unique_together = ['student', 'course']
@@ -35,6 +45,43 @@ class Grade(models.Model):
     grade = models.FloatField()
     date_received = models.DateField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        # The enrollment's aggregates are updated by pre_save/post_save
+        # handlers; keep all of it in one transaction.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Grade for {self.enrollment}: {self.grade}"
+
+class ArchivedEnrollment(models.Model):
+    """
+    An enrollment in a course that ended before the archive cutoff, moved
+    out of Enrollment by courses.archive with its id and grade aggregates
+    intact. Relations skip database constraints so the archive can live in
+    another database (COURSE_ARCHIVE_DATABASE).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    course = models.ForeignKey(Course, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    enrollment_date = models.DateField()
+    grade_count = models.PositiveIntegerField(default=0)
+    grade_sum = models.FloatField(default=0)
+    grade_sum_squares = models.FloatField(default=0)
+    grade_min = models.FloatField(null=True, blank=True)
+    grade_max = models.FloatField(null=True, blank=True)
+    latest_grade = models.FloatField(null=True, blank=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.student.username} enrolled in {self.course.title} (archived)"
+
+class ArchivedGrade(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    enrollment = models.ForeignKey(ArchivedEnrollment, on_delete=models.CASCADE, related_name='grades')
+    grade = models.FloatField()
+    date_received = models.DateField()
+
     def __str__(self):
         return f"Grade for {self.enrollment}: {self.grade}"
 
@@ -59,7 +106,7 @@ class Lesson(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lessons')
     order = models.IntegerField(default=0)  # To maintain lesson sequence
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['order']  # This will ensure lessons are always ordered correctly
@@ -67,3 +114,79 @@ class Lesson(models.Model):
 
     def __str__(self):
         return f"{self.course.title} - {self.title}"
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted course or lesson, so delta sync can tell clients to
+    drop it. Written by courses.signals, pruned by the `prune_tombstones` job.
+    """
+    COURSE = 'course'
+    LESSON = 'lesson'
+    MODEL_CHOICES = [
+        (COURSE, 'Course'),
+        (LESSON, 'Lesson'),
+    ]
+
+    model = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted at {self.deleted_at}"
+
+class RelatedCourse(models.Model):
+    """
+    A "students also took" entry: `related` is the `rank`-th most similar
+    course to `course` by co-enrollment. Rebuilt by the
+    `refresh_related_courses` job (see courses.recommendations).
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='related_courses')
+    related = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    shared_students = models.PositiveIntegerField()
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['course', 'rank']
+        unique_together = ['course', 'rank']
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.related_id} (#{self.rank})"
+
+class Job(models.Model):
+    """
+    A unit of background work, claimed and run by `manage.py run_workers`.
+    See `courses.jobs`.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # Not claimed before this time
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)  # The exception message, shown to the owner
+    traceback = models.TextField(blank=True)  # For the admin only
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
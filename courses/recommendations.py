@@ -0,0 +1,134 @@
+"""
+"Students also took": courses related by co-enrollment.
+
+All enrollments are read in one query into a sparse student × course
+matrix X with a 1 per enrollment. X.T @ X counts the students shared by
+every pair of courses. Dividing each count by the square roots of both
+courses' sizes gives their cosine similarity. Each course's best
+COURSE_RELATED_TOP_K are stored as RelatedCourse rows, so
+`GET /api/courses/{id}/related/` reads k rows.
+
+The `refresh_related_courses` job (or management command) rebuilds the
+table on a schedule. A refresh only rewrites courses whose list changed.
+Given `course_ids`, it computes just those courses' rows, for example
+after a course has just filled up.
+
+numpy and scipy are imported inside the functions that compute, not at
+module level. Web workers import this module through the job registry but
+only serve the stored rows, so they never pay for loading them.
+"""
+from itertools import chain
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router, transaction
+from django.utils import timezone
+
+from .models import Enrollment, RelatedCourse
+
+DEFAULT_TOP_K = 10
+# Pairs sharing fewer students say more about those students than about
+# the courses.
+DEFAULT_MIN_SHARED = 2
+BATCH_SIZE = 500
+# Scores are compared at this precision to tell whether a list changed.
+SCORE_DIGITS = 6
+
+
+def incidence_matrix():
+    """
+    The student × course enrollment matrix (CSC, one 1 per enrollment) and
+    the course id of each column.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    rows = Enrollment.objects.values_list('student_id', 'course_id').iterator(chunk_size=10_000)
+    pairs = np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+    student_ids, students = np.unique(pairs[:, 0], return_inverse=True)
+    course_ids, courses = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csc_matrix(
+        (np.ones(len(pairs), dtype=np.int32), (students, courses)),
+        shape=(len(student_ids), len(course_ids)),
+    )
+    return matrix, course_ids
+
+
+def top_related(matrix, course_ids, columns, top_k, min_shared):
+    """
+    The `top_k` most similar courses to each of `columns` (indices into
+    `course_ids`), among those sharing at least `min_shared` students. Returns
+    parallel arrays of course id, related course id, rank, score and number
+    of shared students, ordered by course and rank.
+    """
+    import numpy as np
+
+    sizes = np.asarray(matrix.sum(axis=0)).ravel()
+    shared = (matrix[:, columns].T @ matrix).tocsr()
+    rows = np.repeat(np.arange(shared.shape[0]), np.diff(shared.indptr))
+    sources = columns[rows]
+    related, counts = shared.indices, shared.data
+
+    keep = (related != sources) & (counts >= min_shared)
+    sources, related, counts = sources[keep], related[keep], counts[keep]
+    scores = counts / np.sqrt(sizes[sources].astype(np.float64) * sizes[related])
+
+    # Best first within each course; ties go to more shared students, then
+    # to the older course.
+    order = np.lexsort((course_ids[related], -counts, -scores, sources))
+    sources, related, counts, scores = sources[order], related[order], counts[order], scores[order]
+    ranks = np.arange(len(sources)) - np.searchsorted(sources, sources)
+    top = ranks < top_k
+    return (course_ids[sources[top]], course_ids[related[top]], ranks[top],
+            scores[top], counts[top])
+
+
+def refresh(course_ids=None, top_k=None, min_shared=None):
+    """
+    Recompute the related courses of `course_ids` (default: every course)
+    and store the lists that changed. Returns the number of courses whose
+    list was rewritten.
+    """
+    try:
+        import numpy as np
+        import scipy.sparse  # noqa: F401 - fail here rather than halfway through
+    except ImportError:  # pragma: no cover - exercised only without numpy and scipy
+        raise ImproperlyConfigured('Course recommendations need numpy and scipy: pip install -r requirements.txt')
+    top_k = top_k or getattr(settings, 'COURSE_RELATED_TOP_K', DEFAULT_TOP_K)
+    if min_shared is None:
+        min_shared = getattr(settings, 'COURSE_RELATED_MIN_SHARED', DEFAULT_MIN_SHARED)
+
+    matrix, all_course_ids = incidence_matrix()
+    if course_ids is None:
+        columns = np.arange(len(all_course_ids))
+    else:
+        columns = np.flatnonzero(np.isin(all_course_ids, list(course_ids)))
+
+    computed = {}
+    for source, related, rank, score, shared in zip(
+            *(array.tolist() for array in top_related(matrix, all_course_ids, columns, top_k, min_shared))):
+        computed.setdefault(source, []).append((related, round(score, SCORE_DIGITS), shared))
+
+    stored_rows = RelatedCourse.objects.order_by('course_id', 'rank')
+    if course_ids is not None:
+        stored_rows = stored_rows.filter(course_id__in=course_ids)
+    stored = {}
+    for source, related, score, shared in stored_rows.values_list(
+            'course_id', 'related_id', 'score', 'shared_students').iterator():
+        stored.setdefault(source, []).append((related, round(score, SCORE_DIGITS), shared))
+
+    changed = sorted(pk for pk in stored.keys() | computed.keys() if stored.get(pk) != computed.get(pk))
+    if not changed:
+        return 0
+    now = timezone.now()
+    with transaction.atomic(using=router.db_for_write(RelatedCourse)):
+        for start in range(0, len(changed), BATCH_SIZE):
+            batch = changed[start:start + BATCH_SIZE]
+            RelatedCourse.objects.filter(course_id__in=batch).delete()
+            RelatedCourse.objects.bulk_create([
+                RelatedCourse(course_id=source, related_id=related, rank=rank, score=score,
+                              shared_students=shared, computed_at=now)
+                for source in batch
+                for rank, (related, score, shared) in enumerate(computed.get(source, ()))
+            ])
+    return len(changed)
@@ -0,0 +1,72 @@
+import math
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without the optional dependency
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+
+def has_non_finite_float(data):
+    """
+    Whether a NaN or infinite float appears anywhere in `data`. orjson
+    writes them as null, where the stock renderer refuses them.
+    """
+    isfinite = math.isfinite
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            value = value.values()
+        elif not isinstance(value, (list, tuple)):
+            continue
+        for item in value:
+            kind = type(item)
+            if kind is float:
+                if not isfinite(item):
+                    return True
+            # Skip the common scalars here rather than push and pop them.
+            elif item is not None and kind is not str and kind is not int and kind is not bool:
+                stack.append(item)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer backed by orjson.
+
+    Output matches the stock renderer byte for byte: dates, times, decimals,
+    UUIDs and lazy strings are all handed to DRF's own encoder. Floats that
+    Python prints in exponent form (``1e-05``) are the one known difference.
+    When orjson is not installed, or it refuses a value (e.g. integers wider
+    than 64 bits, or dict keys that aren't strings), the stock stdlib
+    renderer is used instead. So are NaN and infinite floats, which orjson
+    would write as null, so that they raise ValueError as they do there.
+    """
+    _default = staticmethod(encoders.JSONEncoder().default)
+    _options = orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        # Pretty-printing (browsable API, `; indent=4`) is never hot, leave it to DRF.
+        if orjson is None or self.ensure_ascii or not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self._default, option=self._options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Only output with a null in it can hide one.
+        if b'null' in ret and has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the stock renderer's escaping of U+2028/U+2029 so the output
+        # remains a strict javascript subset.
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,81 @@
+"""
+Term rollover: copy courses with all their lessons into a new term.
+
+Each batch of courses costs a fixed number of statements: one to read the
+courses, one bulk insert for the copies, one read of their lessons and one
+bulk insert for those. Django splits bulk inserts further only where the
+database caps query parameters. The whole rollover runs in one transaction.
+"""
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Min
+
+from .models import Course, Lesson
+
+BATCH_SIZE = 500
+# The API accepts shifts of up to ten years either way.
+MAX_SHIFT_DAYS = 3650
+
+COURSE_COLUMNS = ('id', 'title', 'description', 'instructor_id', 'start_date', 'end_date')
+LESSON_COLUMNS = ('course_id', 'title', 'content', 'order')
+
+
+class DateOutOfRange(ValueError):
+    pass
+
+
+def shift_to_start(courses, start_date):
+    """
+    The shift that moves the earliest of `courses` to begin on `start_date`,
+    keeping the others' offsets from it.
+    """
+    earliest = courses.aggregate(earliest=Min('start_date'))['earliest']
+    return start_date - earliest if earliest is not None else timedelta()
+
+
+def clone_courses(rows, shift, using):
+    try:
+        clones = [
+            Course(**{**row, 'id': None, 'start_date': row['start_date'] + shift, 'end_date': row['end_date'] + shift})
+            for row in rows
+        ]
+    except OverflowError:
+        raise DateOutOfRange(f'Shifting by {shift.days} days moves course dates out of range')
+    if connections[using].features.can_return_rows_from_bulk_insert:
+        return Course.objects.using(using).bulk_create(clones)
+    # Without RETURNING there's no telling which id went to which copy.
+    for clone in clones:
+        clone.save(using=using)
+    return clones
+
+
+def rollover(courses, shift, batch_size=BATCH_SIZE):
+    """
+    Copy `courses` (a Course queryset) and their lessons, moving both dates
+    by `shift` (a timedelta or a number of days). Returns a mapping from
+    each original course id to its copy's id, and the number of lessons
+    copied. Raises DateOutOfRange, having copied nothing, if a shifted date
+    would fall outside the calendar.
+    """
+    if not isinstance(shift, timedelta):
+        shift = timedelta(days=shift)
+    using = router.db_for_write(Course)
+    mapping = {}
+    lesson_count = 0
+    with transaction.atomic(using=using):
+        source_ids = list(courses.using(using).order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(source_ids), batch_size):
+            batch = source_ids[start:start + batch_size]
+            rows = list(Course.objects.using(using).filter(pk__in=batch).order_by('pk').values(*COURSE_COLUMNS))
+            clones = clone_courses(rows, shift, using)
+            batch_mapping = {row['id']: clone.pk for row, clone in zip(rows, clones)}
+            mapping.update(batch_mapping)
+
+            lessons = [
+                Lesson(**{**row, 'course_id': batch_mapping[row['course_id']]})
+                for row in Lesson.objects.using(using).filter(course_id__in=batch).values(*LESSON_COLUMNS)
+            ]
+            Lesson.objects.using(using).bulk_create(lessons)
+            lesson_count += len(lessons)
+    return mapping, lesson_count
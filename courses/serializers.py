@@ -1,6 +1,13 @@
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
-from .models import Course, Instructor, Enrollment, Grade, Lesson
+from .models import Course, Instructor, Enrollment, Grade, Lesson, Job, RelatedCourse
 from django.contrib.auth.models import User
+from .rollover import MAX_SHIFT_DAYS
+
+MAX_STATUS_IDS = 500
+# The largest primary key the database's bigint columns can hold.
+MAX_PK = 2**63 - 1
 
 class InstructorSerializer(serializers.ModelSerializer):
     name = serializers.CharField(source='user.get_full_name', read_only=True)
@@ -30,6 +37,61 @@ class CourseSerializer(serializers.ModelSerializer):
             return obj.enrollments.filter(student=request.user).exists()
         return False
 
+class SyncCourseSerializer(serializers.ModelSerializer):
+    """
+    A course as sent by delta sync: no lessons (they sync on their own) and
+    nothing specific to the requesting user.
+    """
+    instructor = InstructorSerializer(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'description', 'instructor', 'start_date', 'end_date', 'updated_at']
+
+class SyncLessonSerializer(LessonSerializer):
+    class Meta(LessonSerializer.Meta):
+        fields = LessonSerializer.Meta.fields + ['course']
+
+class RolloverSerializer(serializers.Serializer):
+    """
+    Courses to copy into a new term, and how far to move their dates: by
+    `shift_days`, or so that the earliest of them starts on `start_date`.
+    """
+    course_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=5000)
+    shift_days = serializers.IntegerField(required=False, min_value=-MAX_SHIFT_DAYS, max_value=MAX_SHIFT_DAYS)
+    start_date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if ('shift_days' in attrs) == ('start_date' in attrs):
+            raise serializers.ValidationError('Provide exactly one of shift_days and start_date.')
+        return attrs
+
+class BatchRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET'], default='GET')
+    url = serializers.CharField(max_length=2000)
+
+    def validate_url(self, value):
+        if not value.startswith('/'):
+            raise serializers.ValidationError('Use a path from the site root, such as /api/enrollments/.')
+        return value
+
+class BatchSerializer(serializers.Serializer):
+    """
+    Read requests to run in one round trip, answered in the same order.
+    """
+    requests = BatchRequestSerializer(many=True, allow_empty=False, max_length=25)
+
+class EnrollmentStatusQuerySerializer(serializers.Serializer):
+    """
+    The course ids of a bulk enrollment status lookup, bounded so they fit
+    the primary key column.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=MAX_PK),
+        allow_empty=False,
+        max_length=MAX_STATUS_IDS,
+    )
+
 class EnrollmentSerializer(serializers.ModelSerializer):
     course = serializers.SerializerMethodField()
 
@@ -77,6 +139,19 @@ class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
+def count_per_course(model):
+    """
+    Correlated subquery counting `model` rows of the outer course. Unlike
+    Count() over joins, several of these don't multiply each other's rows.
+    """
+    rows = (model.objects
+        .filter(course=OuterRef('pk'))
+        .order_by()
+        .values('course')
+        .annotate(count=Count('pk'))
+        .values('count'))
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
 class InstructorDashboardSerializer(serializers.ModelSerializer):
     total_students = serializers.SerializerMethodField()
     total_lessons = serializers.SerializerMethodField()
@@ -85,18 +160,52 @@ class InstructorDashboardSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = ['id', 'title', 'start_date', 'end_date', 'total_students', 'total_lessons', 'recent_enrollments']
+
+    @staticmethod
+    def prefetch(queryset):
+        """
+        Annotate and prefetch what the fields below read, so a page of
+        courses costs the same few queries however many it holds.
+        """
+        recent = Enrollment.objects.select_related('student').order_by('-enrollment_date')[:5]
+        return (queryset
+            .annotate(student_count=count_per_course(Enrollment),
+                      lesson_count=count_per_course(Lesson))
+            .prefetch_related(Prefetch('enrollments', queryset=recent, to_attr='recent_enrollments')))
     
     def get_total_students(self, obj):
+        if hasattr(obj, 'student_count'):
+            return obj.student_count
         return obj.enrollments.count()
     
     def get_total_lessons(self, obj):
+        if hasattr(obj, 'lesson_count'):
+            return obj.lesson_count
         return obj.lessons.count()
     
     def get_recent_enrollments(self, obj):
-        recent = obj.enrollments.order_by('-enrollment_date')[:5]
+        recent = getattr(obj, 'recent_enrollments', None)
+        if recent is None:
+            recent = obj.enrollments.select_related('student').order_by('-enrollment_date')[:5]
         return [{
             'student_name': enrollment.student.get_full_name() or enrollment.student.username,
             'date': enrollment.enrollment_date
         } for enrollment in recent]
 
+class RelatedCourseSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='related.id', read_only=True)
+    title = serializers.CharField(source='related.title', read_only=True)
+    description = serializers.CharField(source='related.description', read_only=True)
+    start_date = serializers.DateField(source='related.start_date', read_only=True)
+    end_date = serializers.DateField(source='related.end_date', read_only=True)
 
+    class Meta:
+        model = RelatedCourse
+        fields = ['id', 'title', 'description', 'start_date', 'end_date', 'score', 'shared_students']
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at',
+                  'finished_at', 'result', 'last_error']
+        read_only_fields = fields
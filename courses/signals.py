@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import events, grade_stats
+from .models import Course, Enrollment, Grade, Lesson, Tombstone
+
+_muted = ContextVar('courses_signals_muted', default=False)
+
+
+@contextmanager
+def muted():
+    """
+    Skip the delete handlers below, for rows that move elsewhere rather than
+    go away: archival neither ungrades nor unenrolls anybody.
+    """
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
+def deleted_directly(model, origin):
+    """
+    Whether a delete started from `model` itself rather than cascading from
+    a parent. Handlers skip per-row work for rows whose parent goes too.
+    """
+    if origin is None:
+        return True
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+@receiver(pre_save, sender=Grade)
+def remember_stored_grade(sender, instance, using, **kwargs):
+    # Grade.save() runs in a transaction, so the row is locked until the
+    # aggregates have been adjusted by the difference.
+    instance._stored_grade = None
+    if instance.pk is not None:
+        instance._stored_grade = (Grade.objects.using(using)
+            .select_for_update()
+            .filter(pk=instance.pk)
+            .values_list('enrollment_id', 'grade')
+            .first())
+
+
+@receiver(post_save, sender=Grade)
+def update_grade_stats_on_save(sender, instance, created, **kwargs):
+    stored = getattr(instance, '_stored_grade', None)
+    if created or stored is None:
+        grade_stats.grade_added(instance.enrollment_id, instance.grade)
+        return
+    old_enrollment_id, old_grade = stored
+    if old_enrollment_id != instance.enrollment_id:
+        grade_stats.grade_removed(old_enrollment_id, old_grade)
+        grade_stats.grade_added(instance.enrollment_id, instance.grade, is_new=False)
+    elif old_grade != instance.grade:
+        grade_stats.grade_changed(instance.enrollment_id, old_grade, instance.grade)
+
+
+@receiver(post_delete, sender=Grade)
+def update_grade_stats_on_delete(sender, instance, origin=None, **kwargs):
+    # A grade only cascades from its enrollment, whose aggregates go with it.
+    if _muted.get() or not deleted_directly(Grade, origin):
+        return
+    grade_stats.grade_removed(instance.enrollment_id, instance.grade)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+def record_tombstone(sender, instance, using, origin=None, **kwargs):
+    if sender is Lesson and not deleted_directly(Lesson, origin):
+        # Clients drop a deleted course's lessons along with it.
+        return
+    model = Tombstone.COURSE if sender is Course else Tombstone.LESSON
+    Tombstone.objects.using(using).create(model=model, object_id=instance.pk)
+
+
+def publish_on_commit(course_id, event_type, using, **data):
+    """
+    Publish to the course's channel once the transaction commits, so rolled
+    back changes are never announced.
+    """
+    backend = events.get_backend()
+    channel = events.course_channel(course_id)
+    if course_id is None or not backend.has_subscribers(channel):
+        return
+    message = {'type': event_type, 'course_id': course_id, **data}
+    transaction.on_commit(lambda: backend.publish(channel, message), using=using)
+
+
+@receiver(post_save, sender=Enrollment)
+def publish_enrollment_created(sender, instance, created, using, **kwargs):
+    if not created or not events.get_backend().has_subscribers(events.course_channel(instance.course_id)):
+        # Skip loading the student; publish_on_commit has nobody to tell anyway.
+        return
+    student = instance.student
+    publish_on_commit(
+        instance.course_id, 'enrollment.created', using,
+        enrollment_id=instance.pk,
+        student_id=student.pk,
+        student={
+            'id': student.pk,
+            'username': student.username,
+            'full_name': student.get_full_name() or student.username,
+        },
+        enrollment_date=instance.enrollment_date,
+    )
+
+
+@receiver(post_delete, sender=Enrollment)
+def publish_enrollment_deleted(sender, instance, using, **kwargs):
+    if _muted.get():
+        return
+    publish_on_commit(instance.course_id, 'enrollment.deleted', using,
+                      enrollment_id=instance.pk, student_id=instance.student_id)
+
+
+def _grade_enrollment(grade, using):
+    if not events.get_backend().has_subscribers():
+        # Skip the lookup; publish_on_commit has nobody to tell anyway.
+        return None, None
+    if Grade.enrollment.is_cached(grade):
+        return grade.enrollment.course_id, grade.enrollment.student_id
+    return (Enrollment.objects.using(using)
+        .filter(pk=grade.enrollment_id)
+        .values_list('course_id', 'student_id')
+        .first()) or (None, None)
+
+
+@receiver(post_save, sender=Grade)
+def publish_grade_saved(sender, instance, created, using, **kwargs):
+    course_id, student_id = _grade_enrollment(instance, using)
+    publish_on_commit(
+        course_id, 'grade.created' if created else 'grade.updated', using,
+        grade_id=instance.pk, enrollment_id=instance.enrollment_id, student_id=student_id,
+        grade=instance.grade, date_received=instance.date_received,
+    )
+
+
+@receiver(post_delete, sender=Grade)
+def publish_grade_deleted(sender, instance, using, **kwargs):
+    if _muted.get():
+        return
+    course_id, student_id = _grade_enrollment(instance, using)
+    publish_on_commit(course_id, 'grade.deleted', using, grade_id=instance.pk,
+                      enrollment_id=instance.enrollment_id, student_id=student_id)
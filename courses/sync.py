@@ -0,0 +1,123 @@
+"""
+Delta sync of the course catalog for offline clients.
+
+A client keeps the opaque `cursor` from each response and sends it back as
+`since`. It then gets the courses and lessons whose `updated_at` is at or
+after that point, plus the ids of those deleted since (from Tombstone).
+
+The cursor lags the server clock by OVERLAP. A transaction that commits
+late, with an `updated_at` stamped before the previous sync ran, is still
+picked up. Clients therefore receive some rows twice and must apply changes
+as idempotent upserts.
+
+Rows written with QuerySet.update() or bulk_update() don't touch
+`updated_at` and won't sync unless the caller sets it.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .models import Course, Lesson, Tombstone
+from .values_serializers import SyncCourseValuesSerializer, SyncLessonValuesSerializer
+
+OVERLAP = timedelta(seconds=5)
+TOMBSTONE_RETENTION = timedelta(days=30)
+PAGE_SIZE = 1000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _to_micros(moment):
+    return (moment - EPOCH) // MICROSECOND
+
+
+def encode_cursor(position, horizon):
+    return f'{_to_micros(position)}.{_to_micros(horizon)}'
+
+
+def decode_cursor(cursor):
+    """
+    Split a cursor into `position`, where the next page of changes starts,
+    and `horizon`, the earliest deletion the client still needs to hear of.
+    They differ only while a snapshot is being paged through.
+    """
+    try:
+        position, horizon = cursor.split('.')
+        return EPOCH + int(position) * MICROSECOND, EPOCH + int(horizon) * MICROSECOND
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        raise InvalidCursor(f'Invalid sync cursor {cursor!r}')
+
+
+def _page(queryset, field, since, limit):
+    """
+    Rows changed at or after `since`, oldest first, and the point the next
+    page starts from, or None when there are no more rows.
+    """
+    if since is not None:
+        queryset = queryset.filter(**{f'{field}__gte': since})
+    rows = list(queryset.order_by(field, 'pk')[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    boundary = rows[limit][field]
+    if boundary == rows[0][field]:
+        # More than a page shares one timestamp; send all of them at once
+        # rather than never moving past it.
+        rows = list(queryset.filter(**{field: boundary}).order_by('pk'))
+        return rows, boundary + MICROSECOND
+    return rows[:limit], boundary
+
+
+def changes_since(cursor=None, context=None, limit=PAGE_SIZE):
+    """
+    Build the sync response for `cursor`, the value returned by the
+    previous sync, or None for a full snapshot.
+    """
+    now = timezone.now()
+    position, horizon = decode_cursor(cursor) if cursor is not None else (None, None)
+    # Tombstones older than the retention window are pruned, so a client
+    # that far behind has to start over from a snapshot.
+    reset = horizon is None or horizon < now - TOMBSTONE_RETENTION
+    if reset:
+        # Deletions before the snapshot don't concern it.
+        position, horizon = None, now - OVERLAP
+
+    course_serializer = SyncCourseValuesSerializer(context)
+    lesson_serializer = SyncLessonValuesSerializer(context)
+    courses, course_end = _page(Course.objects.values(*course_serializer.columns),
+                                'updated_at', position, limit)
+    lessons, lesson_end = _page(Lesson.objects.values(*lesson_serializer.columns),
+                                'updated_at', position, limit)
+    deleted, deleted_end = _page(Tombstone.objects.values('model', 'object_id', 'deleted_at'),
+                                 'deleted_at', max(position or horizon, horizon), limit)
+
+    ends = [end for end in (course_end, lesson_end, deleted_end) if end is not None]
+    if ends:
+        # Stop every collection where the shortest one stopped; the rest
+        # comes with the next page.
+        next_position = min(ends)
+        courses = [row for row in courses if row['updated_at'] < next_position]
+        lessons = [row for row in lessons if row['updated_at'] < next_position]
+        deleted = [row for row in deleted if row['deleted_at'] < next_position]
+        next_horizon = horizon
+    else:
+        next_position = now - OVERLAP
+        if position is not None:
+            next_position = max(next_position, position)
+        next_horizon = next_position
+
+    return {
+        'cursor': encode_cursor(next_position, next_horizon),
+        'has_more': bool(ends),
+        'reset': reset,
+        'courses': course_serializer.represent_rows(courses),
+        'lessons': lesson_serializer.represent_rows(lessons),
+        'deleted': {
+            'courses': [row['object_id'] for row in deleted if row['model'] == Tombstone.COURSE],
+            'lessons': [row['object_id'] for row in deleted if row['model'] == Tombstone.LESSON],
+        },
+    }
@@ -0,0 +1,83 @@
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from . import archive, grade_stats, recommendations
+from .jobs import job
+from .models import Enrollment, Tombstone
+from .sync import TOMBSTONE_RETENTION
+
+
+@job()
+def flush_expired_tokens():
+    """
+    Delete expired outstanding (and with them blacklisted) refresh tokens.
+    """
+    deleted, _ = OutstandingToken.objects.filter(expires_at__lte=aware_utcnow()).delete()
+    return {'deleted': deleted}
+
+
+@job()
+def export_course_roster(course_id):
+    """
+    Build the roster of a course; the rows are stored as the job's result.
+    """
+    roster = (Enrollment.objects
+        .filter(course_id=course_id)
+        .order_by('student__last_name', 'student__first_name', 'student__username')
+        .values_list('student_id', 'student__username', 'student__first_name',
+                     'student__last_name', 'student__email', 'enrollment_date'))
+    return {
+        'course_id': course_id,
+        'students': [{
+            'id': student_id,
+            'username': username,
+            'full_name': f'{first_name} {last_name}'.strip() or username,
+            'email': email,
+            'enrollment_date': enrollment_date.isoformat(),
+        } for student_id, username, first_name, last_name, email, enrollment_date in roster],
+    }
+
+
+@job()
+def recompute_grade_stats(course_id=None):
+    """
+    Rebuild enrollments' running grade aggregates, e.g. after grades were
+    imported with bulk_create.
+    """
+    enrollments = Enrollment.objects.all()
+    if course_id is not None:
+        enrollments = enrollments.filter(course_id=course_id)
+    grade_stats.recompute(enrollments)
+    return {'course_id': course_id}
+
+
+@job()
+def prune_tombstones():
+    """
+    Drop deletion records older than sync's retention window; clients that
+    far behind are sent a fresh snapshot instead.
+    """
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()
+    return {'deleted': deleted}
+
+
+@job()
+def archive_finished_courses(batch_size=500, max_batches=100):
+    """
+    Archive a bounded number of batches, then queue the rest as a new job so
+    no single run holds a worker for long.
+    """
+    totals = archive.archive_finished(batch_size=batch_size, max_batches=max_batches)
+    if not totals['done']:
+        archive_finished_courses.enqueue(batch_size=batch_size, max_batches=max_batches)
+    return totals
+
+
+@job()
+def refresh_related_courses(course_ids=None):
+    """
+    Recompute "students also took" lists, for all courses or `course_ids`.
+    Meant to be enqueued on a schedule, e.g. nightly.
+    """
+    return {'courses_updated': recommendations.refresh(course_ids)}
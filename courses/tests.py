@@ -1,3 +1,1343 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import zlib
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from pathlib import Path
+from urllib.parse import urlencode
+from uuid import UUID
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models.query import QuerySet
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, reverse
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.mixins import ListModelMixin
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from course_management import preload
+
+from . import archive, events, grade_stats, jobs, recommendations, rollover, sync, urls
+from .event_views import StreamTicket
+from .middleware import CompressionMiddleware, brotli
+from .mixins import ValuesListMixin
+from .models import (
+    ArchivedEnrollment,
+    ArchivedGrade,
+    Course,
+    Enrollment,
+    Grade,
+    Instructor,
+    Job,
+    Lesson,
+    RelatedCourse,
+    Tombstone,
+)
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .serializers import InstructorDashboardSerializer, LessonSerializer, SyncCourseSerializer, SyncLessonSerializer
+from .tasks import prune_tombstones, refresh_related_courses
+from .values_serializers import SyncCourseValuesSerializer, SyncLessonValuesSerializer
+from .views import CourseViewSet
+from .throttling import SlidingWindowThrottle, parse_rate
+
+
+class CourseDataMixin:
+    """
+    A small catalog: two instructors (one without a full name), a course
+    without an instructor, lessons, enrollments and grades.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user('teacher', first_name='Ada', last_name='Lovelace')
+        cls.instructor = Instructor.objects.create(user=cls.teacher, bio='Mathematician')
+        cls.other_teacher = User.objects.create_user('other')
+        cls.other_instructor = Instructor.objects.create(user=cls.other_teacher)
+        cls.student = User.objects.create_user('student', first_name='Sam')
+        cls.other_student = User.objects.create_user('other_student')
+
+        cls.courses = [
+            Course.objects.create(
+                title='Algebra \u2028 I', description='Groups', instructor=cls.instructor,
+                start_date=date(2024, 9, 1), end_date=date(2024, 12, 20),
+            ),
+            Course.objects.create(
+                title='Géométrie', description='Shapes', instructor=cls.other_instructor,
+                start_date=date(2024, 9, 2), end_date=date(2024, 12, 21),
+            ),
+            Course.objects.create(
+                title='Orphaned', description='', instructor=None,
+                start_date=date(2025, 1, 6), end_date=date(2025, 4, 1),
+            ),
+        ]
+        for course in cls.courses[:2]:
+            for order in (2, 1, 3):
+                Lesson.objects.create(course=course, title=f'Lesson {order}', content='Read.', order=order)
+            for student in (cls.student, cls.other_student):
+                enrollment = Enrollment.objects.create(student=student, course=course)
+                Grade.objects.create(enrollment=enrollment, grade=71.5)
+                Grade.objects.create(enrollment=enrollment, grade=90)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def assertSameBytes(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_matches_stock_renderer(self):
+        self.assertSameBytes({
+            'id': 1,
+            'title': 'Algèbre   linéaire',
+            'grade': 87.25,
+            'start_date': date(2024, 9, 1),
+            'created_at': datetime(2024, 9, 1, 8, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'naive': datetime(2024, 9, 1, 8, 30),
+            'at': time(9, 15),
+            'price': Decimal('19.90'),
+            'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+            'nested': [{'a': None, 'b': True}, (1, 2)],
+            3: 'int key',
+        })
+
+    def test_non_finite_floats_raise_like_stock(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            data = {'courses': [{'id': 1, 'instructor': None, 'stats': {'mean': value}}]}
+            with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                FastJSONRenderer().render(data)
+        self.assertSameBytes({'mean': None, 'grades': [1.5, (2.5, None)]})
+
+    def test_non_string_keys_match_stock(self):
+        self.assertSameBytes({1.5: 'a', True: 'b', None: 'c'})
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({date(2024, 9, 1): 'a'})
+
+    def test_empty_and_indented(self):
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        self.assertEqual(
+            FastJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+        )
+
+    def test_parser_round_trip(self):
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"title": "Ünïcode", "n": [1, 2.5]}'.encode())),
+                         {'title': 'Ünïcode', 'n': [1, 2.5]})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"a": NaN}'))
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"title":"Course","description":"Repetitive payload"}' * 50
+
+    def process(self, response, accept_encoding, cookies=None):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        request.COOKIES.update(cookies or {})
+        return CompressionMiddleware(lambda request: response).process_response(request, response)
+
+    def test_gzip(self):
+        response = self.process(HttpResponse(self.body), 'gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_brotli_preferred_when_accepted(self):
+        if brotli is None:
+            self.skipTest('brotli is not installed')
+        response = self.process(HttpResponse(self.body), 'gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+        response = self.process(HttpResponse(self.body), 'gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_streaming(self):
+        if brotli is None:
+            self.skipTest('brotli is not installed')
+        response = self.process(StreamingHttpResponse(iter([self.body, self.body])), 'br')
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(brotli.decompress(b''.join(chunks)), self.body * 2)
+
+    def test_gzip_streaming_flushes_every_chunk(self):
+        response = self.process(StreamingHttpResponse(iter([self.body, self.body])), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        decompressor = zlib.decompressobj(wbits=31)
+        chunks = iter(response.streaming_content)
+        # Each chunk decompresses in full before the next one is produced.
+        self.assertEqual(decompressor.decompress(next(chunks)), self.body)
+        self.assertEqual(decompressor.decompress(next(chunks)), self.body)
+        self.assertEqual(decompressor.decompress(b''.join(chunks)), b'')
+        self.assertTrue(decompressor.eof)
+
+    def test_cookies_get_padded_gzip_instead_of_brotli(self):
+        if brotli is None:
+            self.skipTest('brotli is not installed')
+        response = self.process(HttpResponse(self.body), 'gzip, br', cookies={'sessionid': 'secret'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_vary_on_cookie_when_brotli_depends_on_it(self):
+        if brotli is None:
+            self.skipTest('brotli is not installed')
+        # Both variants of a brotli-capable request, so a shared cache keys
+        # them apart.
+        for cookies in ({}, {'sessionid': 'secret'}):
+            response = self.process(HttpResponse(self.body), 'gzip, br', cookies=cookies)
+            self.assertEqual(response['Vary'], 'Accept-Encoding, Cookie')
+        # Without br the choice doesn't depend on cookies.
+        response = self.process(HttpResponse(self.body), 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_event_streams_are_not_compressed(self):
+        response = StreamingHttpResponse(iter([b'data: 1\n\n']), content_type='text/event-stream')
+        response = self.process(response, 'gzip, br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class ValuesSerializerParityTests(CourseDataMixin, TestCase):
+    """
+    The `.values()` fast path must render byte-identical output to the
+    ModelSerializers it replaces.
+    """
+    def get_both(self, url, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        fast = client.get(url)
+        with mock.patch.object(ValuesListMixin, 'list', ListModelMixin.list):
+            slow = client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(slow.status_code, 200)
+        return fast.content, slow.content
+
+    def assertParity(self, url, user=None):
+        fast, slow = self.get_both(url, user)
+        self.assertEqual(fast, slow)
+        return fast
+
+    def test_course_list(self):
+        self.assertParity('/api/courses/')
+        content = self.assertParity('/api/courses/', self.student)
+        self.assertIn(b'"is_enrolled":true', content)
+
+    def test_enrollment_list(self):
+        self.assertParity('/api/enrollments/', self.student)
+
+    def test_grade_list(self):
+        self.assertParity('/api/grades/', self.teacher)
+
+    def test_instructor_lessons(self):
+        course = self.courses[0]
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        for tz in ('UTC', 'Asia/Kolkata'):
+            with timezone.override(tz):
+                response = client.get(f'/api/courses/{course.pk}/instructor_lessons/')
+                expected = LessonSerializer(course.lessons.all().order_by('order'), many=True).data
+                self.assertEqual(
+                    JSONRenderer().render(response.data['lessons']),
+                    JSONRenderer().render(expected),
+                )
+
+    def test_sync_serializers(self):
+        courses = Course.objects.order_by('pk')
+        lessons = Lesson.objects.order_by('pk')
+        self.assertEqual(
+            JSONRenderer().render(SyncCourseValuesSerializer().to_representation(courses)),
+            JSONRenderer().render(SyncCourseSerializer(courses, many=True).data),
+        )
+        self.assertEqual(
+            JSONRenderer().render(SyncLessonValuesSerializer().to_representation(lessons)),
+            JSONRenderer().render(SyncLessonSerializer(lessons, many=True).data),
+        )
+
+    def test_constant_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        with self.assertNumQueries(3):
+            client.get('/api/courses/')
+
+
+@jobs.job(max_attempts=2)
+def flaky_task(fail):
+    if fail:
+        raise ValueError('boom')
+    return {'ok': True}
+
+
+class JobQueueTests(CourseDataMixin, TestCase):
+    def setUp(self):
+        self.worker = jobs.Worker(stop_event=None, name='test-worker')
+
+    def test_run_to_success(self):
+        job = flaky_task.enqueue(owner=self.student, fail=False)
+        self.assertEqual(self.worker.run_once(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'ok': True})
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_retry_with_backoff_then_fail(self):
+        job = flaky_task.enqueue(fail=True)
+        self.worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.last_error, 'ValueError: boom')
+        self.assertIn('Traceback', job.traceback)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(self.worker.run_once(), 0)  # Not due yet.
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.worker.run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_claims_are_exclusive(self):
+        flaky_task.enqueue(fail=False)
+        self.assertEqual(len(jobs.claim_jobs('a', limit=5)), 1)
+        self.assertEqual(jobs.claim_jobs('b', limit=5), [])
+
+    def test_stale_locks_are_reclaimed(self):
+        flaky_task.enqueue(fail=False)
+        jobs.claim_jobs('dead-worker')
+        Job.objects.update(locked_at=timezone.now() - jobs.LOCK_TIMEOUT - timedelta(seconds=1))
+        self.assertEqual(len(jobs.claim_jobs('b')), 1)
+
+    def test_stale_locks_on_the_last_attempt_fail(self):
+        job = flaky_task.enqueue(fail=False)  # max_attempts=2
+        for worker in ('dead-worker', 'dead-again'):
+            self.assertEqual(len(jobs.claim_jobs(worker)), 1)
+            Job.objects.update(locked_at=timezone.now() - jobs.LOCK_TIMEOUT - timedelta(seconds=1))
+        self.assertEqual(jobs.claim_jobs('b'), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIn('stopped responding', job.last_error)
+
+    def test_export_roster_and_status_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        response = client.post(f'/api/courses/{self.courses[0].pk}/export_roster/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        self.assertNotIn('traceback', response.data)
+
+        self.worker.run_once()
+        response = client.get(f"/api/jobs/{response.data['id']}/")
+        self.assertEqual(response.data['status'], Job.SUCCEEDED)
+        self.assertEqual(
+            [student['username'] for student in response.data['result']['students']],
+            ['other_student', 'student'],
+        )
+
+        other = APIClient()
+        other.force_authenticate(self.student)
+        self.assertEqual(other.get('/api/jobs/').data, [])
+        response = other.post(f'/api/courses/{self.courses[0].pk}/export_roster/')
+        self.assertEqual(response.status_code, 403)
+
+
+
+@jobs.job()
+def slow_task(seconds):
+    threading.Event().wait(seconds)
+    return {}
+
+
+class RunWorkersCommandTests(TransactionTestCase):
+    def test_run_workers_command(self):
+        flaky_task.enqueue(fail=False)
+        flaky_task.enqueue(fail=False)
+        with mock.patch('signal.signal'):
+            call_command('run_workers', '--once', '--threads=1', stdout=io.StringIO())
+        self.assertEqual(Job.objects.filter(status=Job.SUCCEEDED).count(), 2)
+
+    def test_running_jobs_keep_their_lock_fresh(self):
+        first, second = slow_task.enqueue(seconds=0.3), slow_task.enqueue(seconds=0)
+        worker = jobs.Worker(stop_event=None, batch_size=2, name='test-worker')
+        claimed_at = timezone.now()
+        with mock.patch.object(jobs, 'HEARTBEAT_INTERVAL', timedelta(milliseconds=50)):
+            self.assertEqual(worker.run_once(), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, Job.SUCCEEDED)
+        # Locked when claimed, the second job waited behind the first and
+        # had its lock refreshed meanwhile.
+        self.assertGreater(second.locked_at, claimed_at + timedelta(milliseconds=200))
+
+
+class StartupTests(SimpleTestCase):
+    def test_boot_leaves_out_what_requests_do_not_need(self):
+        # A fresh interpreter, since this one has imported everything.
+        script = ('import sys\n'
+                  'from course_management.wsgi import application\n'
+                  'print(sorted({"course_management.urls", "courses.admin", "django.test",\n'
+                  '              "rest_framework_simplejwt.settings"} & sys.modules.keys()))\n')
+        loaded = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        self.assertEqual(loaded.strip(), '[]')
+
+    def test_preload_is_opt_in(self):
+        with mock.patch.object(preload, 'import_module') as import_module:
+            preload.preload_urlconf()
+            import_module.assert_not_called()
+            with self.settings(PRELOAD_URLCONF=True):
+                preload.preload_urlconf()
+            import_module.assert_called_once_with(settings.ROOT_URLCONF)
+
+    def test_admin_loads_with_its_urls(self):
+        self.assertEqual(reverse('admin:courses_course_changelist'), '/admin/courses/course/')
+
+
+class AdminChangelistQueryTests(CourseDataMixin, TestCase):
+    """
+    Changelists must run the same number of queries however many rows
+    they show.
+    """
+    changelists = ['course', 'enrollment', 'grade', 'instructor', 'lesson', 'job']
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+
+    def add_rows(self, n):
+        for i in range(n):
+            user = User.objects.create_user(f'bulk{i}')
+            Instructor.objects.create(user=user)
+            course = Course.objects.create(
+                title=f'Bulk {i}', description='', instructor=self.instructor,
+                start_date=date(2024, 9, 1), end_date=date(2024, 12, 1),
+            )
+            Lesson.objects.create(course=course, title='Intro', content='', order=1)
+            enrollment = Enrollment.objects.create(student=user, course=course)
+            Grade.objects.create(enrollment=enrollment, grade=80)
+            Job.objects.create(name='flush_expired_tokens')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_grow_with_rows(self):
+        small = {name: self.count_queries(f'/admin/courses/{name}/') for name in self.changelists}
+        self.add_rows(10)
+        for name in self.changelists:
+            with self.subTest(changelist=name):
+                self.assertEqual(self.count_queries(f'/admin/courses/{name}/'), small[name])
+
+    def test_course_filter_does_not_list_courses(self):
+        response = self.client.get('/admin/courses/enrollment/')
+        self.assertNotContains(response, 'Orphaned')
+
+    def test_course_id_filter(self):
+        course = self.courses[0]
+        response = self.client.get(f'/admin/courses/grade/?course_id={course.pk}')
+        self.assertEqual(response.context['cl'].result_count, 4)
+        self.assertContains(response, f'name="course_id" value="{course.pk}"')
+        response = self.client.get(f'/admin/courses/enrollment/?course_id={course.pk}')
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+
+class GradeStatsTests(CourseDataMixin, TestCase):
+    def assertStatsMatchGrades(self, enrollment):
+        enrollment.refresh_from_db()
+        grades = list(enrollment.grades.order_by('date_received', 'id').values_list('grade', flat=True))
+        self.assertEqual(enrollment.grade_count, len(grades))
+        self.assertAlmostEqual(enrollment.grade_sum, sum(grades))
+        self.assertAlmostEqual(enrollment.grade_sum_squares, sum(g * g for g in grades))
+        self.assertEqual(enrollment.grade_min, min(grades, default=None))
+        self.assertEqual(enrollment.grade_max, max(grades, default=None))
+        self.assertEqual(enrollment.latest_grade, grades[-1] if grades else None)
+
+    def test_create_update_move_delete(self):
+        enrollment, other = Enrollment.objects.filter(student=self.student)
+        self.assertStatsMatchGrades(enrollment)
+
+        grade = Grade.objects.create(enrollment=enrollment, grade=55)
+        self.assertStatsMatchGrades(enrollment)
+
+        lowest = enrollment.grades.get(grade=55)
+        lowest.grade = 99
+        lowest.save()
+        self.assertStatsMatchGrades(enrollment)
+
+        grade.refresh_from_db()
+        grade.enrollment = other
+        grade.save()
+        self.assertStatsMatchGrades(enrollment)
+        self.assertStatsMatchGrades(other)
+
+        enrollment.grades.get(grade=90).delete()
+        self.assertStatsMatchGrades(enrollment)
+        other.grades.all().delete()
+        self.assertStatsMatchGrades(other)
+
+    def test_cascaded_grades_leave_the_aggregates_alone(self):
+        enrollment = Enrollment.objects.filter(student=self.student).first()
+        # Collect and delete the enrollment and its grades, with no aggregate
+        # update per grade.
+        with self.assertNumQueries(4):
+            Enrollment.objects.filter(pk=enrollment.pk).delete()
+        other = Enrollment.objects.filter(student=self.other_student).first()
+        other.grades.first().delete()
+        self.assertStatsMatchGrades(other)
+
+    def test_recompute(self):
+        enrollment = Enrollment.objects.filter(student=self.student).first()
+        Grade.objects.bulk_create([Grade(enrollment=enrollment, grade=g) for g in (10, 100)])
+        grade_stats.recompute()
+        self.assertStatsMatchGrades(enrollment)
+
+    def test_transcript(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        with self.assertNumQueries(1):
+            response = client.get('/api/transcript/')
+        self.assertEqual(response.status_code, 200)
+        first = response.data['enrollments'][0]
+        self.assertEqual(first['course']['title'], self.courses[0].title)
+        self.assertEqual(first['grade_count'], 2)
+        self.assertEqual(first['mean'], 80.75)
+        self.assertEqual((first['min'], first['max'], first['latest']), (71.5, 90, 90))
+        self.assertAlmostEqual(first['std_dev'], 9.25)
+        self.assertEqual(response.data['overall'], {'grade_count': 4, 'weighted_average': 80.75})
+
+
+THROTTLE_RATES = {'login_ip': '3/10s', 'login_username': '2/10s', 'enroll_user': '2/10s'}
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': THROTTLE_RATES})
+class ThrottleTests(CourseDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        timer = mock.patch.object(SlidingWindowThrottle, 'timer', return_value=100.0)
+        self.timer = timer.start()
+        self.addCleanup(timer.stop)
+
+    def login(self, username, ip='10.0.0.1'):
+        return APIClient().post('/api/login/', {'username': username, 'password': 'wrong'},
+                                format='json', REMOTE_ADDR=ip)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/min'), (5, 60))
+        self.assertEqual(parse_rate('100/hour'), (100, 3600))
+        self.assertEqual(parse_rate('10/15m'), (10, 900))
+
+    def test_non_object_bodies_are_rejected_not_crashed(self):
+        for url in ('/api/login/', '/api/token/'):
+            response = APIClient().post(url, [1, 2], format='json', REMOTE_ADDR='10.0.0.9')
+            self.assertEqual(response.status_code, 400)
+
+    def test_sliding_window(self):
+        for username in ('a', 'b', 'c'):
+            self.assertEqual(self.login(username).status_code, 401)
+        response = self.login('d')
+        self.assertEqual(response.status_code, 429)
+        # The next window opens in 10s; by then 3 * (1 - 1/3) + 1 fits.
+        self.assertEqual(response['Retry-After'], '14')
+
+        # 2s into the next window the previous one still weighs 3 * 0.8.
+        self.timer.return_value = 112.0
+        response = self.login('e')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '2')
+        self.timer.return_value = 113.4
+        self.assertEqual(self.login('f').status_code, 401)
+
+    def test_username_throttled_across_addresses(self):
+        self.assertEqual(self.login('Student', ip='10.0.0.1').status_code, 401)
+        self.assertEqual(self.login('student', ip='10.0.0.2').status_code, 401)
+        self.assertEqual(self.login('student', ip='10.0.0.3').status_code, 429)
+        self.assertEqual(self.login('teacher', ip='10.0.0.3').status_code, 401)
+
+    def test_enroll_throttled_per_user(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        course = self.courses[2]
+        self.assertEqual(client.post(f'/api/courses/{course.pk}/enroll/').status_code, 201)
+        self.assertEqual(client.post(f'/api/courses/{course.pk}/enroll/').status_code, 200)
+        self.assertEqual(client.post(f'/api/courses/{course.pk}/enroll/').status_code, 429)
+
+        client.force_authenticate(self.other_student)
+        self.assertEqual(client.post(f'/api/courses/{course.pk}/enroll/').status_code, 201)
+        # Unthrottled actions share no counters with enroll.
+        self.assertEqual(client.get(f'/api/courses/{course.pk}/enrollment_status/').status_code, 200)
+
+
+class SyncTests(CourseDataMixin, TestCase):
+    def setUp(self):
+        # Well outside the overlap window, so only changes made by a test sync.
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Course.objects.update(updated_at=an_hour_ago)
+        Lesson.objects.update(updated_at=an_hour_ago)
+        self.client = APIClient()
+
+    def sync(self, since=None):
+        response = self.client.get('/api/sync/', {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_snapshot_then_changes(self):
+        with self.assertNumQueries(3):
+            snapshot = self.sync()
+        self.assertTrue(snapshot['reset'])
+        self.assertFalse(snapshot['has_more'])
+        self.assertEqual(len(snapshot['courses']), 3)
+        self.assertEqual(len(snapshot['lessons']), 6)
+        self.assertNotIn('lessons', snapshot['courses'][0])
+        self.assertEqual(snapshot['courses'][0]['instructor']['name'], 'Ada Lovelace')
+
+        self.assertEqual(self.sync(snapshot['cursor'])['courses'], [])
+
+        course = self.courses[1]
+        course.title = 'Geometry'
+        course.save()
+        removed_id = Lesson.objects.filter(course=course).values_list('pk', flat=True).first()
+        Lesson.objects.get(pk=removed_id).delete()
+        added = Lesson.objects.create(course=self.courses[2], title='Intro', content='', order=1)
+        deleted_course_id = self.courses[0].pk
+        self.courses[0].delete()
+
+        changes = self.sync(snapshot['cursor'])
+        self.assertFalse(changes['reset'])
+        self.assertEqual([c['title'] for c in changes['courses']], ['Geometry'])
+        self.assertEqual([l['id'] for l in changes['lessons']], [added.pk])
+        self.assertEqual(changes['lessons'][0]['course'], self.courses[2].pk)
+        self.assertEqual(changes['deleted']['courses'], [deleted_course_id])
+        # Lessons deleted along with their course are implied by it.
+        self.assertEqual(changes['deleted']['lessons'], [removed_id])
+
+    def test_course_delete_implies_its_lessons(self):
+        cursor = self.sync()['cursor']
+        course, course_id = self.courses[0], self.courses[0].pk
+        # The course's tombstone only, however many lessons it had.
+        with CaptureQueriesContext(connection) as queries:
+            course.delete()
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "courses_tombstone"')]
+        self.assertEqual(len(inserts), 1)
+
+        # Lessons deleted on their own, one by one or in bulk, still are.
+        first, *rest = self.courses[1].lessons.order_by('pk')
+        deleted_ids = [first.pk] + [lesson.pk for lesson in rest]
+        first.delete()
+        Lesson.objects.filter(pk__in=deleted_ids[1:]).delete()
+        changes = self.sync(cursor)
+        self.assertEqual(changes['deleted']['courses'], [course_id])
+        self.assertEqual(sorted(changes['deleted']['lessons']), deleted_ids)
+
+    def test_paging(self):
+        Tombstone.objects.create(model=Tombstone.LESSON, object_id=999,
+                                 deleted_at=timezone.now() - timedelta(minutes=1))
+        start = timezone.now() - timedelta(hours=1)
+        for i, pk in enumerate(Lesson.objects.order_by('?').values_list('pk', flat=True)):
+            Lesson.objects.filter(pk=pk).update(updated_at=start + timedelta(seconds=i))
+        cursor, courses, lessons, pages = None, set(), set(), 0
+        while True:
+            page = sync.changes_since(cursor, limit=2)
+            pages += 1
+            self.assertLessEqual(len(page['lessons']), 2)
+            courses.update(c['id'] for c in page['courses'])
+            lessons.update(l['id'] for l in page['lessons'])
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(pages, 4)
+        self.assertEqual(courses, set(Course.objects.values_list('pk', flat=True)))
+        self.assertEqual(lessons, set(Lesson.objects.values_list('pk', flat=True)))
+        # Deleted before the snapshot began.
+        self.assertEqual(page['deleted']['lessons'], [])
+
+    def test_tied_timestamps_are_sent_together(self):
+        page = sync.changes_since(limit=2)
+        self.assertTrue(page['has_more'])
+        self.assertEqual(len(page['lessons']), 6)
+
+    def test_stale_and_invalid_cursors(self):
+        month_ago = timezone.now() - sync.TOMBSTONE_RETENTION - timedelta(days=1)
+        self.assertTrue(self.sync(sync.encode_cursor(month_ago, month_ago))['reset'])
+        response = self.client.get('/api/sync/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_prune_tombstones(self):
+        Tombstone.objects.create(model=Tombstone.COURSE, object_id=1,
+                                 deleted_at=timezone.now() - sync.TOMBSTONE_RETENTION - timedelta(days=1))
+        Tombstone.objects.create(model=Tombstone.COURSE, object_id=2)
+        self.assertEqual(prune_tombstones(), {'deleted': 1})
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [2])
+
+
+class EventTests(CourseDataMixin, TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def receive(self, subscription):
+        return self.loop.run_until_complete(subscription.get(timeout=1))
+
+    def test_backend_fan_out(self):
+        backend = events.InMemoryBackend()
+        first = backend.subscribe(['course:1', 'course:2'], loop=self.loop)
+        second = backend.subscribe(['course:2'], loop=self.loop)
+
+        publisher = threading.Thread(target=backend.publish, args=('course:2', {'n': 1}))
+        publisher.start()
+        publisher.join()
+        backend.publish('course:3', {'n': 2})
+        self.assertEqual(self.receive(first), {'n': 1})
+        self.assertEqual(self.receive(second), {'n': 1})
+        self.assertIsNone(self.loop.run_until_complete(first.get(timeout=0.01)))
+
+        first.close()
+        second.close()
+        self.assertFalse(backend.has_subscribers())
+
+    def test_overflow(self):
+        backend = events.InMemoryBackend()
+        backend.max_pending = 2
+        subscription = backend.subscribe(['course:1'], loop=self.loop)
+        for n in range(3):
+            backend.publish('course:1', {'n': n})
+        self.assertEqual(self.receive(subscription), {'n': 0})
+        self.assertTrue(subscription.overflowed)
+
+    def test_changes_published_on_commit(self):
+        course = self.courses[0]
+        subscription = events.get_backend().subscribe([events.course_channel(course.pk)], loop=self.loop)
+        self.addCleanup(subscription.close)
+        newcomer = User.objects.create_user('newcomer', first_name='Nia', last_name='Cole')
+        client = APIClient()
+        client.force_authenticate(newcomer)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(f'/api/courses/{course.pk}/enroll/')
+        message = self.receive(subscription)
+        self.assertEqual(message['type'], 'enrollment.created')
+        self.assertEqual(message['student'], {'id': newcomer.pk, 'username': 'newcomer', 'full_name': 'Nia Cole'})
+
+        enrollment = Enrollment.objects.get(student=newcomer)
+        with self.captureOnCommitCallbacks(execute=True):
+            grade = Grade.objects.create(enrollment=enrollment, grade=88)
+            grade.grade = 91
+            grade.save()
+            Grade.objects.get(pk=grade.pk).delete()
+            client.post(f'/api/courses/{course.pk}/unenroll/')
+        types = [self.receive(subscription)['type'] for _ in range(4)]
+        self.assertEqual(types, ['grade.created', 'grade.updated', 'grade.deleted', 'enrollment.deleted'])
+
+        # Nothing is announced for work that is rolled back.
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Enrollment.objects.create(student=newcomer, course=course)
+        self.assertEqual(len(callbacks), 1)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Enrollment.objects.create(student=newcomer, course=self.courses[1])
+        self.assertEqual(callbacks, [])
+
+    def test_unwatched_enrollment_does_not_load_the_student(self):
+        course = self.courses[0]
+        subscription = events.get_backend().subscribe([events.course_channel(course.pk)], loop=self.loop)
+        self.addCleanup(subscription.close)
+        newcomer = User.objects.create_user('newcomer')
+        # Just the insert: nobody watches this course, so the student isn't read.
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks() as callbacks:
+            Enrollment.objects.create(student_id=newcomer.pk, course=self.courses[1])
+        self.assertEqual(callbacks, [])
+        with self.assertNumQueries(2), self.captureOnCommitCallbacks() as callbacks:
+            Enrollment.objects.create(student_id=newcomer.pk, course=course)
+        self.assertEqual(len(callbacks), 1)
+
+    async def test_stream(self):
+        course = self.courses[0]
+        token = str(AccessToken.for_user(self.teacher))
+        response = await self.async_client.get('/api/instructor/events/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertNotIn('Content-Encoding', response)
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        events.get_backend().publish(events.course_channel(course.pk), {'type': 'grade.deleted', 'grade_id': 7})
+        self.assertEqual(
+            await anext(stream),
+            b'event: grade.deleted\ndata: {"type":"grade.deleted","grade_id":7}\n\n',
+        )
+        # A client disconnecting cancels the read in progress.
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertFalse(events.get_backend().has_subscribers())
+
+    async def test_stream_requires_instructor(self):
+        ticket = str(StreamTicket.for_user(self.student))
+        response = await self.async_client.get('/api/instructor/events/', {'ticket': ticket})
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get('/api/instructor/events/', {'ticket': 'nonsense'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_ticket(self):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        response = await sync_to_async(client.post)('/api/instructor/events/ticket/')
+        self.assertEqual(response.status_code, 403)
+        client.force_authenticate(self.teacher)
+        response = await sync_to_async(client.post)('/api/instructor/events/ticket/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['expires_in'], 30)
+
+        url = '/api/instructor/events/'
+        ticket = response.data['ticket']
+        self.assertEqual((await self.async_client.get(url, {'ticket': ticket})).status_code, 200)
+        # Spent once used.
+        self.assertEqual((await self.async_client.get(url, {'ticket': ticket})).status_code, 401)
+        # Access tokens don't go in URLs, and tickets don't authenticate the API.
+        access = str(AccessToken.for_user(self.teacher))
+        self.assertEqual((await self.async_client.get(url, {'ticket': access})).status_code, 401)
+        self.assertEqual((await self.async_client.get(url, {'token': access})).status_code, 401)
+        fresh = str(StreamTicket.for_user(self.teacher))
+        response = await self.async_client.get('/api/jobs/', headers={'Authorization': f'Bearer {fresh}'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_stream_requires_asgi(self):
+        client = APIClient()
+        client.force_authenticate(self.teacher)
+        self.assertEqual(client.get('/api/instructor/events/').status_code, 501)
+
+
+class ArchiveTests(CourseDataMixin, TestCase):
+    def setUp(self):
+        self.finished = self.courses[0]
+        Course.objects.update(end_date=timezone.localdate() + timedelta(days=30))
+        Course.objects.filter(pk=self.finished.pk).update(end_date=archive.cutoff_date() - timedelta(days=1))
+
+    def test_archive_in_batches(self):
+        hot = list(Enrollment.objects.filter(course=self.finished).order_by('pk').values(*archive.ENROLLMENT_COLUMNS))
+        subscription = events.get_backend().subscribe(
+            [events.course_channel(self.finished.pk)], loop=asyncio.new_event_loop(),
+        )
+        self.addCleanup(subscription.close)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            totals = archive.archive_finished(batch_size=1)
+        self.assertEqual(totals, {'enrollments': 2, 'grades': 4, 'batches': 2, 'done': True})
+        # Moving rows is neither an unenrollment nor a grade change.
+        self.assertEqual(callbacks, [])
+
+        self.assertFalse(Enrollment.objects.filter(course=self.finished).exists())
+        self.assertEqual(Enrollment.objects.count(), 2)
+        self.assertEqual(
+            list(ArchivedEnrollment.objects.order_by('pk').values(*archive.ENROLLMENT_COLUMNS)), hot,
+        )
+        self.assertEqual(ArchivedGrade.objects.count(), 4)
+        self.assertEqual(archive.archive_finished()['enrollments'], 0)
+
+    def test_restart_after_failure(self):
+        real_delete = QuerySet.delete
+        calls = []
+
+        def fail_second_batch(queryset):
+            # Each batch deletes grades, then enrollments.
+            calls.append(queryset.model)
+            if len(calls) == 4:
+                raise RuntimeError('connection lost')
+            return real_delete(queryset)
+
+        with mock.patch.object(QuerySet, 'delete', fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                archive.archive_finished(batch_size=1)
+        # The first batch committed; the second rolled back entirely.
+        self.assertEqual(ArchivedEnrollment.objects.count(), 1)
+        self.assertEqual(Enrollment.objects.filter(course=self.finished).count(), 1)
+
+        self.assertEqual(archive.archive_finished(batch_size=1)['enrollments'], 1)
+        self.assertEqual(ArchivedEnrollment.objects.count(), 2)
+        self.assertEqual(ArchivedGrade.objects.count(), 4)
+
+    def test_read_fallback(self):
+        archive.archive_finished()
+        client = APIClient()
+        client.force_authenticate(self.student)
+
+        self.assertEqual(len(client.get('/api/enrollments/').data), 1)
+        enrollments = client.get('/api/enrollments/', {'include_archived': '1'}).data
+        self.assertEqual([e['course']['title'] for e in enrollments], ['Géométrie', self.finished.title])
+
+        transcript = client.get('/api/transcript/', {'include_archived': 'true'}).data
+        first = transcript['enrollments'][0]
+        self.assertTrue(first['archived'])
+        self.assertEqual((first['course']['title'], first['mean']), (self.finished.title, 80.75))
+        self.assertEqual(transcript['overall']['grade_count'], 4)
+
+        client.force_authenticate(self.teacher)
+        self.assertEqual(client.get('/api/grades/').data, [])
+        self.assertEqual(len(client.get('/api/grades/', {'include_archived': '1'}).data), 4)
+        roster = client.get(f'/api/courses/{self.finished.pk}/instructor_enrollments/',
+                            {'include_archived': '1'}).data['enrollments']
+        self.assertEqual({e['student']['username'] for e in roster}, {'student', 'other_student'})
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('archive_courses', '--batch-size', '10', stdout=out)
+        self.assertIn('Archived 2 enrollment(s) and 4 grade(s) in 1 batch(es), done', out.getvalue())
+
+
+class RolloverTests(CourseDataMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+        self.second = Course.objects.create(
+            title='Algebra II', description='Rings', instructor=self.instructor,
+            start_date=date(2024, 9, 15), end_date=date(2024, 12, 20),
+        )
+        Lesson.objects.create(course=self.second, title='Rings', content='Read.', order=1)
+
+    def test_rollover_action(self):
+        source = self.courses[0]
+        response = self.client.post('/api/courses/rollover/', {
+            'course_ids': [source.pk, self.second.pk], 'start_date': '2025-09-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['lessons_copied'], 4)
+
+        mapping = {row['source_id']: row['id'] for row in response.data['courses']}
+        copy = Course.objects.get(pk=mapping[source.pk])
+        self.assertEqual((copy.title, copy.instructor, copy.start_date, copy.end_date),
+                         (source.title, self.instructor, date(2025, 9, 1), date(2025, 12, 20)))
+        self.assertEqual(
+            list(copy.lessons.values_list('order', 'title')),
+            list(source.lessons.values_list('order', 'title')),
+        )
+        # Offsets between the courses are kept.
+        self.assertEqual(Course.objects.get(pk=mapping[self.second.pk]).start_date, date(2025, 9, 15))
+
+    def test_rollover_rejects_other_instructors_courses(self):
+        response = self.client.post('/api/courses/rollover/', {
+            'course_ids': [self.courses[0].pk, self.courses[1].pk], 'shift_days': 364,
+        }, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post('/api/courses/rollover/', {
+            'course_ids': [self.courses[0].pk], 'shift_days': 364, 'start_date': '2025-09-01',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Course.objects.count(), 4)
+
+    def test_rollover_rejects_dates_out_of_range(self):
+        ids = [self.courses[0].pk, self.second.pk]
+        for body in ({'shift_days': 4_000_000}, {'shift_days': -3651}, {'start_date': '9999-12-30'}):
+            response = self.client.post('/api/courses/rollover/', {'course_ids': ids, **body}, format='json')
+            self.assertEqual(response.status_code, 400, body)
+        self.assertEqual(Course.objects.count(), 4)
+        with self.assertRaises(CommandError):
+            call_command('rollover_courses', '--ids', str(ids[0]), '--shift-days', '4000000000',
+                         stdout=io.StringIO())
+
+    def test_out_of_range_error_names_the_option_used(self):
+        late = Course.objects.create(title='Late', description='', instructor=self.instructor,
+                                     start_date=date(9990, 1, 1), end_date=date(9998, 1, 1))
+        for body, field in (({'shift_days': 3650}, 'shift_days'), ({'start_date': '9999-06-01'}, 'start_date')):
+            response = self.client.post('/api/courses/rollover/', {'course_ids': [late.pk], **body}, format='json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(list(response.json()), [field])
+
+    def test_constant_queries_per_batch(self):
+        counts = []
+        for ids in ([self.courses[0].pk], [self.courses[0].pk, self.courses[1].pk, self.second.pk]):
+            with CaptureQueriesContext(connection) as queries:
+                rollover.rollover(Course.objects.filter(pk__in=ids), 364)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+        with CaptureQueriesContext(connection) as queries:
+            rollover.rollover(Course.objects.filter(pk__in=[self.courses[0].pk, self.second.pk]), 364, batch_size=1)
+        # Two batches: one more read and insert of courses and of lessons each.
+        self.assertEqual(len(queries), counts[0] + 4)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('rollover_courses', '--instructor', 'teacher', '--shift-days', '364', stdout=out)
+        self.assertIn('Copied 2 course(s) and 4 lesson(s)', out.getvalue())
+        self.assertEqual(Course.objects.filter(start_date=date(2025, 8, 31)).count(), 1)
+
+
+class RecommendationTests(CourseDataMixin, TestCase):
+    def setUp(self):
+        # Algebra and Geometry share both fixture students. Three more take
+        # Algebra and Topology, and one of them Geometry too.
+        self.topology = Course.objects.create(title='Topology', description='', start_date=date(2024, 9, 1),
+                                              end_date=date(2024, 12, 20))
+        for i in range(3):
+            student = User.objects.create_user(f'extra{i}')
+            Enrollment.objects.create(student=student, course=self.courses[0])
+            Enrollment.objects.create(student=student, course=self.topology)
+        Enrollment.objects.create(student=student, course=self.courses[1])
+
+    def related(self, course):
+        return list(RelatedCourse.objects.filter(course=course).values_list('related_id', 'shared_students'))
+
+    def test_ranks_by_cosine_similarity(self):
+        algebra, geometry, orphaned = self.courses
+        self.assertEqual(recommendations.refresh(), 3)
+
+        # Geometry and Topology tie at 3 / sqrt(5 * 3); the older course wins.
+        self.assertEqual(self.related(algebra), [(geometry.pk, 3), (self.topology.pk, 3)])
+        self.assertEqual(self.related(geometry), [(algebra.pk, 3)])  # Topology shares only one
+        self.assertEqual(self.related(self.topology), [(algebra.pk, 3)])
+        self.assertEqual(self.related(orphaned), [])
+        self.assertAlmostEqual(RelatedCourse.objects.get(course=geometry).score, 3 / (5 * 3) ** 0.5, places=6)
+
+        with self.assertNumQueries(2):  # nothing changed, nothing written
+            self.assertEqual(recommendations.refresh(), 0)
+
+    def test_top_k_and_min_shared(self):
+        algebra, geometry, _ = self.courses
+        recommendations.refresh(top_k=1, min_shared=1)
+        self.assertEqual(self.related(algebra), [(geometry.pk, 3)])
+        self.assertEqual(self.related(geometry), [(algebra.pk, 3)])
+        self.assertEqual(self.related(self.topology), [(algebra.pk, 3)])
+
+        recommendations.refresh(min_shared=1)
+        self.assertEqual(self.related(geometry), [(algebra.pk, 3), (self.topology.pk, 1)])
+
+    def test_refresh_only_given_courses(self):
+        algebra, geometry, _ = self.courses
+        recommendations.refresh()
+        Enrollment.objects.filter(course=self.topology).delete()
+
+        self.assertEqual(recommendations.refresh(course_ids=[self.topology.pk]), 1)
+        self.assertEqual(self.related(self.topology), [])
+        # Stale until its own refresh.
+        self.assertEqual(self.related(algebra), [(geometry.pk, 3), (self.topology.pk, 3)])
+        self.assertEqual(recommendations.refresh(), 1)
+        self.assertEqual(self.related(algebra), [(geometry.pk, 3)])
+
+    def test_related_endpoint(self):
+        algebra, geometry, _ = self.courses
+        recommendations.refresh()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/courses/{algebra.pk}/related/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([course['id'] for course in response.json()], [geometry.pk, self.topology.pk])
+        self.assertEqual(response.json()[0]['title'], 'Géométrie')
+        self.assertEqual(response.json()[0]['shared_students'], 3)
+        self.assertEqual(self.client.get('/api/courses/999999/related/').status_code, 404)
+
+    def test_job_and_command(self):
+        job = refresh_related_courses.enqueue()
+        jobs.Worker(stop_event=None, name='test-worker').run_once()
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'courses_updated': 3})
+        self.assertEqual(RelatedCourse.objects.count(), 4)
+        out = io.StringIO()
+        call_command('refresh_related_courses', '--ids', str(self.topology.pk), '--top-k', '5', stdout=out)
+        self.assertIn('0 course(s)', out.getvalue())
+
+    def test_web_workers_do_not_load_numpy(self):
+        # A fresh interpreter: this one already has numpy from the tests above.
+        script = ('import sys\n'
+                  'from course_management.wsgi import application\n'
+                  'from courses import jobs\n'
+                  'jobs.get_task("refresh_related_courses")\n'
+                  'print(sorted({"numpy", "scipy"} & sys.modules.keys()))\n')
+        loaded = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        self.assertEqual(loaded.strip(), '[]')
+
+
+class BatchTests(CourseDataMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.student)}')
+
+    def batch(self, *urls):
+        return self.client.post('/api/batch/', {'requests': [{'url': url} for url in urls]}, format='json')
+
+    def test_subrequests_match_separate_requests_and_authenticate_once(self):
+        urls = [
+            '/api/enrollments/',
+            f'/api/courses/{self.courses[0].pk}/lessons/',
+            f'/api/courses/{self.courses[1].pk}/enrollment_status/',
+            '/api/transcript/?include_archived=1',
+        ]
+        separate = [self.client.get(url) for url in urls]
+
+        authenticate = JWTAuthentication.authenticate
+        with mock.patch.object(JWTAuthentication, 'authenticate', autospec=True,
+                               side_effect=authenticate) as spy:
+            response = self.batch(*urls)
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['responses'],
+            [{'status': r.status_code, 'body': r.json()} for r in separate],
+        )
+
+    def test_subrequest_errors_are_reported_per_request(self):
+        response = self.batch('/api/nowhere/', '/api/batch/', '/api/instructor/dashboard/',
+                              '/api/instructor/events/', '/api/courses/999999/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.json()['responses']], [404, 400, 403, 400, 404])
+
+    def test_subrequest_crash_fails_only_that_request(self):
+        with mock.patch.object(CourseViewSet, 'retrieve', side_effect=RuntimeError('boom')), \
+                self.assertLogs('courses.batch_views', 'ERROR') as logs:
+            response = self.batch(f'/api/courses/{self.courses[0].pk}/', '/api/courses/')
+        self.assertEqual(response.status_code, 200)
+        crashed, listed = response.json()['responses']
+        self.assertEqual(crashed, {'status': 500, 'body': {'detail': 'A server error occurred.'}})
+        self.assertEqual(listed['status'], 200)
+        self.assertIn('RuntimeError: boom', logs.output[0])
+
+    def test_rejects_writes_and_bad_batches(self):
+        response = self.client.post('/api/batch/', {'requests': [{'method': 'POST', 'url': '/api/logout/'}]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.batch('api/enrollments/').status_code, 400)
+        self.assertEqual(self.batch().status_code, 400)
+        self.assertEqual(self.batch(*['/api/enrollments/'] * 26).status_code, 400)
+
+        self.client.credentials()
+        self.assertEqual(self.batch('/api/enrollments/').status_code, 401)
+
+    def test_bulk_enrollment_status(self):
+        ids = f'{self.courses[2].pk},{self.courses[0].pk},999999'
+        with self.assertNumQueries(2):  # the user, then the statuses
+            response = self.client.get(f'/api/courses/enrollment_status/?ids={ids}')
+        self.assertEqual(response.json(), [
+            {'is_enrolled': True, 'course_id': self.courses[0].pk, 'student_id': self.student.pk},
+            {'is_enrolled': False, 'course_id': self.courses[2].pk, 'student_id': self.student.pk},
+        ])
+        self.assertEqual(self.client.get('/api/courses/enrollment_status/?ids=1,x').status_code, 400)
+        self.assertEqual(self.client.get('/api/courses/enrollment_status/').status_code, 400)
+        for ids in ('99999999999999999999999', '0', '-1', ','.join(map(str, range(1, 502)))):
+            response = self.client.get(f'/api/courses/enrollment_status/?ids={ids}')
+            self.assertEqual(response.status_code, 400, ids)
+            self.assertIn('ids', response.json())
+
+    def test_out_of_range_ids_in_a_batch(self):
+        response = self.batch('/api/courses/enrollment_status/?ids=99999999999999999999999')
+        self.assertEqual(response.json()['responses'][0]['status'], 400)
+
+
+QUERY_BUDGETS = Path(__file__).with_name('query_budgets.json')
+
+
+def route_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from route_names(pattern.url_patterns)
+        elif pattern.name and 'format' not in pattern.pattern.regex.groupindex:
+            yield pattern.name
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTests(CourseDataMixin, TestCase):
+    """
+    Every route in courses/urls.py, requested against a small and a larger
+    dataset. The number of queries must not grow with the data and must stay
+    within the budget checked in at courses/query_budgets.json. After an
+    intended change, rerun with UPDATE_QUERY_BUDGETS=1 to rewrite it.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.student.set_password('secret-pass')
+        cls.student.save()
+        cls.course = cls.courses[0]
+        cls.lesson = cls.course.lessons.first()
+        cls.enrollment = Enrollment.objects.get(student=cls.student, course=cls.course)
+        cls.grade = cls.enrollment.grades.first()
+        cls.job = Job.objects.create(name='flush_expired_tokens', owner=cls.teacher)
+        # Start with one of everything, so that the larger dataset only adds rows.
+        archived = ArchivedEnrollment.objects.create(
+            id=9_999, student=cls.student, course=cls.courses[2], enrollment_date=date(2023, 9, 1),
+        )
+        ArchivedGrade.objects.create(id=9_999, enrollment=archived, grade=65, date_received=date(2023, 10, 1))
+        Tombstone.objects.create(model=Tombstone.COURSE, object_id=9_999)
+        RelatedCourse.objects.create(course=cls.course, related=cls.courses[1], rank=0, score=1, shared_students=2)
+
+    def grow(self):
+        """
+        Add rows wherever a query per row could hide.
+        """
+        students = [User.objects.create_user(f'extra{i}', first_name='Extra') for i in range(8)]
+        courses = [
+            Course.objects.create(title=f'Extra {i}', description='', instructor=self.instructor,
+                                  start_date=date(2024, 9, 1), end_date=date(2024, 12, 20))
+            for i in range(3)
+        ]
+        for course in [self.course, *courses]:
+            for order in range(10, 15):
+                Lesson.objects.create(course=course, title=f'Lesson {order}', content='', order=order)
+            for student in students:
+                enrollment = Enrollment.objects.create(student=student, course=course)
+                Grade.objects.create(enrollment=enrollment, grade=70)
+        for i, course in enumerate(courses):
+            enrollment = Enrollment.objects.create(student=self.student, course=course)
+            Grade.objects.create(enrollment=enrollment, grade=80)
+            archived = ArchivedEnrollment.objects.create(
+                id=10_000 + i, student=self.student, course=course, enrollment_date=date(2023, 9, 1),
+            )
+            ArchivedGrade.objects.create(id=10_000 + i, enrollment=archived, grade=60, date_received=date(2023, 10, 1))
+            Tombstone.objects.create(model=Tombstone.LESSON, object_id=10_000 + i)
+        for grade in Grade.objects.filter(enrollment__course=self.course)[:5]:
+            grade.grade += 1
+            grade.save()
+        Job.objects.bulk_create([Job(name='flush_expired_tokens', owner=self.teacher) for _ in range(5)])
+        RelatedCourse.objects.bulk_create([
+            RelatedCourse(course=self.course, related=course, rank=rank, score=0.5, shared_students=8)
+            for rank, course in enumerate(courses, start=1)
+        ])
+
+    def route_requests(self):
+        """
+        (route name, URL kwargs, method, user, data) for every request the
+        suite makes. GET data is sent as query parameters, other data as JSON;
+        callables are evaluated right before the request.
+        """
+        course = {'pk': self.course.pk}
+        lesson = {'course_pk': self.course.pk, 'pk': self.lesson.pk}
+        new_course = {'title': 'New', 'description': 'New', 'start_date': '2025-01-06', 'end_date': '2025-04-01'}
+        archived = {'include_archived': '1'}
+        return [
+            ('api-root', {}, 'get', self.student, None),
+            ('course-list', {}, 'get', self.student, None),
+            ('course-list', {}, 'post', self.teacher, new_course),
+            ('course-rollover', {}, 'post', self.teacher, {'course_ids': [self.course.pk], 'shift_days': 364}),
+            ('course-detail', course, 'get', self.student, None),
+            ('course-detail', course, 'patch', self.teacher, {'title': 'Renamed'}),
+            ('course-detail', course, 'delete', self.teacher, None),
+            ('course-enroll', {'pk': self.courses[2].pk}, 'post', self.student, None),
+            ('course-related', course, 'get', self.student, None),
+            ('course-enrollment-status', course, 'get', self.student, None),
+            ('course-bulk-enrollment-status', {}, 'get', self.student,
+             {'ids': ','.join(str(c.pk) for c in self.courses)}),
+            ('course-enrollments', course, 'get', self.teacher, None),
+            ('course-export-roster', course, 'post', self.teacher, None),
+            ('course-instructor-enrollments', course, 'get', self.teacher, None),
+            ('course-instructor-enrollments', course, 'get', self.teacher, archived),
+            ('course-instructor-lessons', course, 'get', self.teacher, None),
+            ('course-unenroll', course, 'post', self.student, None),
+            ('enrollment-list', {}, 'get', self.student, None),
+            ('enrollment-list', {}, 'get', self.student, archived),
+            ('enrollment-list', {}, 'post', self.student, {'course': self.courses[2].pk, 'student': self.student.pk}),
+            ('enrollment-detail', {'pk': self.enrollment.pk}, 'get', self.student, None),
+            ('enrollment-detail', {'pk': self.enrollment.pk}, 'delete', self.student, None),
+            ('grade-list', {}, 'get', self.teacher, None),
+            ('grade-list', {}, 'get', self.teacher, archived),
+            ('grade-list', {}, 'post', self.teacher, {'enrollment': self.enrollment.pk, 'grade': 88}),
+            ('grade-detail', {'pk': self.grade.pk}, 'get', self.teacher, None),
+            ('grade-detail', {'pk': self.grade.pk}, 'patch', self.teacher, {'grade': 95}),
+            ('grade-detail', {'pk': self.grade.pk}, 'delete', self.teacher, None),
+            ('job-list', {}, 'get', self.teacher, None),
+            ('job-detail', {'pk': self.job.pk}, 'get', self.teacher, None),
+            ('course-lessons-list', {'course_pk': self.course.pk}, 'get', self.student, None),
+            ('course-lessons-list', {'course_pk': self.course.pk}, 'post', self.teacher,
+             {'title': 'New', 'content': 'New', 'order': 99}),
+            ('course-lessons-detail', lesson, 'get', self.student, None),
+            ('course-lessons-detail', lesson, 'patch', self.teacher, {'title': 'Renamed'}),
+            ('course-lessons-detail', lesson, 'delete', self.teacher, None),
+            ('register', {}, 'post', None, {'username': 'newcomer', 'email': 'new@example.com',
+                                            'password': 'secret-pass', 'user_type': 'student'}),
+            ('login', {}, 'post', None, {'username': 'student', 'password': 'secret-pass'}),
+            ('logout', {}, 'post', self.student, lambda: {'refresh_token': str(RefreshToken.for_user(self.student))}),
+            ('batch', {}, 'post', self.student, {'requests': [
+                {'url': '/api/enrollments/'},
+                {'url': f'/api/courses/{self.course.pk}/lessons/'},
+                {'url': f'/api/courses/enrollment_status/?ids={self.course.pk}'},
+            ]}),
+            ('student-transcript', {}, 'get', self.student, None),
+            ('student-transcript', {}, 'get', self.student, archived),
+            ('sync', {}, 'get', None, None),
+            ('sync', {}, 'get', None, lambda: {'since': sync.changes_since()['cursor']}),
+            ('instructor-dashboard', {}, 'get', self.teacher, None),
+            ('instructor-events', {}, 'get', self.teacher, None),
+            ('instructor-events-ticket', {}, 'post', self.teacher, None),
+            ('course-details', {'course_id': self.course.pk}, 'get', self.teacher, None),
+        ]
+
+    def budget_key(self, name, method, data):
+        key = f'{method.upper()} {name}'
+        if method == 'get' and data:
+            key += '?' + '&'.join(sorted(data))
+        return key
+
+    def count_queries(self, name, kwargs, method, user, data):
+        url = reverse(name, kwargs=kwargs)
+        cache.clear()  # No throttle should kick in.
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                if name == 'instructor-events':
+                    # Served over ASGI only; the stream itself is never read.
+                    ticket = StreamTicket.for_user(user)
+                    response = async_to_sync(self.async_client.get)(url, {'ticket': str(ticket)})
+                elif method == 'get':
+                    response = client.get(url, data)
+                else:
+                    response = getattr(client, method)(url, data, format='json')
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, f'{method.upper()} {url}: {response.status_code} {getattr(response, "content", b"")[:200]}')
+        return len(queries)
+
+    def count_all(self):
+        counts = {}
+        for name, kwargs, method, user, data in self.route_requests():
+            if callable(data):
+                data = data()
+            counts[self.budget_key(name, method, data)] = self.count_queries(name, kwargs, method, user, data)
+        return counts
+
+    def test_dashboard_prefetch_matches_per_course_queries(self):
+        self.grow()
+        courses = Course.objects.filter(instructor=self.instructor).order_by('pk')
+        with self.assertNumQueries(2):
+            prefetched = InstructorDashboardSerializer(
+                InstructorDashboardSerializer.prefetch(courses), many=True).data
+        self.assertEqual(prefetched, InstructorDashboardSerializer(courses, many=True).data)
+        self.assertEqual(prefetched[0]['total_students'], 10)
+        self.assertEqual(prefetched[0]['total_lessons'], 8)
+        self.assertEqual(prefetched[-1]['total_lessons'], 5)
+        # Counting through joins would multiply enrollments by lessons.
+        self.assertNotIn('JOIN', str(InstructorDashboardSerializer.prefetch(courses).query))
+
+    def test_every_route_is_exercised(self):
+        exercised = {name for name, *_ in self.route_requests()}
+        self.assertEqual(set(route_names(urls.urlpatterns)) - exercised, set())
+
+    def test_query_budgets(self):
+        small = self.count_all()
+        self.grow()
+        large = self.count_all()
+
+        if os.environ.get('UPDATE_QUERY_BUDGETS'):
+            QUERY_BUDGETS.write_text(json.dumps(large, indent=2, sort_keys=True) + '\n')
+        budgets = json.loads(QUERY_BUDGETS.read_text())
+        self.assertEqual(set(budgets), set(large), 'query_budgets.json is out of date with the routes tested')
+        for key in large:
+            with self.subTest(key):
+                self.assertEqual(large[key], small[key], 'query count grows with the data')
+                self.assertLessEqual(large[key], budgets[key], 'over budget')
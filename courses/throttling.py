@@ -0,0 +1,154 @@
+"""
+Sliding-window request throttles.
+
+Each (scope, kind, client) keeps one counter per fixed window in the cache.
+The request rate is estimated from the current window's count plus the
+previous window's count, weighted by how much of the previous window still
+overlaps the sliding window. The estimate needs no per-request timestamps.
+Checking a request costs one atomic `incr` and one `get`.
+
+Rates are read from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] under
+'<scope>_<kind>', e.g. 'login_ip'. The view's `throttle_scope` supplies the
+scope. A view whose scope has no rate for a throttle's kind is not throttled
+by it. Counters live in the `throttle_cache` alias. Give it a shared
+backend (Redis, Memcached) in production so every worker process sees the
+same counts.
+"""
+import re
+import time
+from collections.abc import Mapping
+from functools import lru_cache
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Turn '5/min', '100/hour' or '10/15m' into (requests, seconds).
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d*)\s*([smhd])[a-z]*\s*', rate or '')
+    if not match:
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}')
+    requests, multiplier, unit = match.groups()
+    return int(requests), int(multiplier or 1) * PERIODS[unit]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Base class; subclasses set `kind` and implement `get_client_key`.
+    """
+    kind = None
+    throttle_cache = 'default'
+    timer = time.time
+
+    def get_client_key(self, request, view):
+        """
+        Identify the client, or return None to skip throttling the request.
+        """
+        raise NotImplementedError('.get_client_key() must be overridden')
+
+    def get_rate(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return None
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.kind}')
+        return parse_rate(rate) if rate else None
+
+    def allow_request(self, request, view):
+        rate = self.get_rate(view)
+        if rate is None:
+            return True
+        client = self.get_client_key(request, view)
+        if client is None:
+            return True
+
+        self.limit, self.duration = rate
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        prefix = f'throttle:{view.throttle_scope}_{self.kind}:{client}'
+        key = f'{prefix}:{window}'
+        cache = caches[self.throttle_cache]
+
+        # Count first, so concurrent requests can't all squeeze under the limit.
+        try:
+            current = cache.incr(key)
+        except ValueError:
+            if cache.add(key, 1, self.duration * 2):
+                current = 1
+            else:
+                current = cache.incr(key)
+        self.previous = cache.get(f'{prefix}:{window - 1}', 0)
+        self.current = current
+        if self.estimate(self.previous, current) <= self.limit:
+            return True
+
+        # Rejected requests don't count against the client.
+        cache.decr(key)
+        self.current = current - 1
+        return False
+
+    def elapsed_fraction(self, at=None):
+        now = self.now if at is None else at
+        return (now % self.duration) / self.duration
+
+    def estimate(self, previous, current, at=None):
+        return previous * (1 - self.elapsed_fraction(at)) + current
+
+    def wait(self):
+        """
+        Seconds until one more request fits under the limit.
+        """
+        allowed = self.limit - 1
+        window_left = self.duration - self.now % self.duration
+        if self.current > allowed:
+            # Not before the next window, and then only once this window's
+            # count has decayed enough.
+            return window_left + self.duration * max(1 - allowed / self.current, 0)
+        # The previous window's weight must decay to what's left.
+        needed = 1 - (allowed - self.current) / self.previous
+        return max((needed - self.elapsed_fraction()) * self.duration, 0)
+
+
+class IPThrottle(SlidingWindowThrottle):
+    """
+    Throttle by client address, honouring NUM_PROXIES like DRF's throttles.
+    """
+    kind = 'ip'
+
+    def get_client_key(self, request, view):
+        return self.get_ident(request)
+
+
+class UserThrottle(SlidingWindowThrottle):
+    """
+    Throttle authenticated users by id. Anonymous requests are left to
+    IPThrottle.
+    """
+    kind = 'user'
+
+    def get_client_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class UsernameThrottle(SlidingWindowThrottle):
+    """
+    Throttle login attempts per submitted username, which catches guessing
+    spread across many addresses.
+    """
+    kind = 'username'
+
+    def get_client_key(self, request, view):
+        # A body that isn't an object is left to the serializer to reject.
+        username = request.data.get('username') if isinstance(request.data, Mapping) else None
+        if not isinstance(username, str) or not username:
+            return None
+        # Cache keys must stay short and free of whitespace or control characters.
+        return username.strip().lower().encode('utf-8').hex()[:150]
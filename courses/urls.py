@@ -1,31 +1,32 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
-from .views import CourseViewSet, EnrollmentViewSet, GradeViewSet, LessonViewSet, instructor_dashboard, course_details
+from .views import CourseViewSet, EnrollmentViewSet, GradeViewSet, JobViewSet, LessonViewSet, instructor_dashboard, course_details, student_transcript, sync_catalog
 from .auth_views import RegisterView, LoginView, LogoutView
+from .batch_views import batch
+from .event_views import instructor_events, instructor_events_ticket
 
 router = DefaultRouter()
 router.register(r'courses', CourseViewSet)
 router.register(r'enrollments', EnrollmentViewSet)
 router.register(r'grades', GradeViewSet)
+router.register(r'jobs', JobViewSet)
 
 # Create nested router for lessons
 courses_router = routers.NestedDefaultRouter(router, r'courses', lookup='course')
 courses_router.register(r'lessons', LessonViewSet, basename='course-lessons')
 
-# Add this debug print
-print("Available URL patterns:")
-for url in router.urls:
-    print(f"  {url.pattern}")
-for url in courses_router.urls:
-    print(f"  {url.pattern}")
-
 urlpatterns = [
     path('', include(router.urls)),
     path('', include(courses_router.urls)),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    path('batch/', batch, name='batch'),
+    path('transcript/', student_transcript, name='student-transcript'),
+    path('sync/', sync_catalog, name='sync'),
     path('instructor/dashboard/', instructor_dashboard, name='instructor-dashboard'),
+    path('instructor/events/', instructor_events, name='instructor-events'),
+    path('instructor/events/ticket/', instructor_events_ticket, name='instructor-events-ticket'),
     path('instructor/courses/<int:course_id>/details/', course_details, name='course-details'),
 ]
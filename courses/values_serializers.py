@@ -0,0 +1,229 @@
+"""
+Read-only serializers that build responses straight from `.values()` rows.
+
+Each class mirrors one of the ModelSerializers in `serializers.py` and must
+produce exactly the same output; `courses.tests` enforces that. Field
+mappers are compiled once per class from the mirrored serializer's own
+fields, so adding a plain model field there needs no change here. Nested and
+method fields are filled in by `get_<field>(row)` hooks, with related rows
+loaded in bulk by `prepare()`.
+"""
+from collections import defaultdict
+from datetime import date, timezone as dt_timezone
+
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+from .models import Course, Enrollment, Lesson
+from .serializers import (
+    CourseSerializer,
+    EnrollmentSerializer,
+    GradeSerializer,
+    JobSerializer,
+    LessonSerializer,
+    SyncCourseSerializer,
+    SyncLessonSerializer,
+)
+
+
+class DateTimeMapper:
+    """
+    ISO 8601 DateTimeField output without re-resolving the field's timezone
+    for every value. `bind()` is called once per batch of rows.
+    """
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self):
+        field = self.field
+        tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+        def to_representation(value):
+            if tz is not None:
+                value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+            elif timezone.is_aware(value):
+                value = timezone.make_naive(value, dt_timezone.utc)
+            value = value.isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return to_representation
+
+
+def compile_mapper(field):
+    """
+    Return a callable turning a raw column value into `field`'s representation,
+    or None when the value is already in its final form.
+    """
+    if isinstance(field, serializers.DateTimeField):
+        if str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601:
+            return DateTimeMapper(field)
+        return field.to_representation
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        # `.values('fk')` already yields the primary key.
+        return None
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.FloatField):
+        return float
+    if isinstance(field, serializers.CharField):
+        return str
+    if isinstance(field, serializers.DateField) and \
+            str(getattr(field, 'format', api_settings.DATE_FORMAT)).lower() == ISO_8601:
+        return date.isoformat
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Base class for `.values()` backed read-only serializers.
+
+    Subclasses set `serializer_class` to the ModelSerializer they mirror and
+    list the fields they compute themselves in `computed_fields`, together
+    with any `extra_values` columns those computations need.
+    """
+    serializer_class = None
+    computed_fields = ()
+    extra_values = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    @classmethod
+    def compile(cls):
+        if '_plan' not in cls.__dict__:
+            plan = []
+            columns = []
+            for name, field in cls.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if name in cls.computed_fields:
+                    plan.append((name, None, getattr(cls, f'get_{name}')))
+                    continue
+                column = field.source.replace('.', '__')
+                columns.append(column)
+                plan.append((name, column, compile_mapper(field)))
+            cls._plan = tuple(plan)
+            cls._columns = tuple(columns) + tuple(cls.extra_values)
+        return cls._plan
+
+    @property
+    def columns(self):
+        self.compile()
+        return self._columns
+
+    def prepare(self, queryset, rows):
+        """
+        Hook for loading related data for a page of rows in bulk.
+        """
+
+    def to_representation(self, queryset):
+        rows = list(queryset.values(*self.columns))
+        self.prepare(queryset, rows)
+        return self.represent_rows(rows)
+
+    def represent_rows(self, rows):
+        plan = [
+            (name, column, mapper.bind() if isinstance(mapper, DateTimeMapper) else mapper)
+            for name, column, mapper in self.compile()
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, mapper in plan:
+                if column is None:
+                    item[name] = mapper(self, row)
+                else:
+                    value = row[column]
+                    item[name] = value if value is None or mapper is None else mapper(value)
+            data.append(item)
+        return data
+
+
+class LessonValuesSerializer(ValuesSerializer):
+    serializer_class = LessonSerializer
+
+
+class GradeValuesSerializer(ValuesSerializer):
+    serializer_class = GradeSerializer
+
+
+class JobValuesSerializer(ValuesSerializer):
+    serializer_class = JobSerializer
+
+
+class CourseValuesSerializer(ValuesSerializer):
+    serializer_class = CourseSerializer
+    computed_fields = ('instructor', 'is_enrolled', 'lessons')
+    extra_values = (
+        'instructor_id', 'instructor__bio', 'instructor__user__username',
+        'instructor__user__first_name', 'instructor__user__last_name',
+    )
+
+    def prepare(self, queryset, rows):
+        course_ids = queryset.values('pk')
+
+        lesson_serializer = LessonValuesSerializer(self.context)
+        lesson_rows = list(
+            Lesson.objects.filter(course_id__in=course_ids)
+            .values('course_id', *lesson_serializer.columns)
+        )
+        self.lessons = defaultdict(list)
+        for row, lesson in zip(lesson_rows, lesson_serializer.represent_rows(lesson_rows)):
+            self.lessons[row['course_id']].append(lesson)
+
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            self.enrolled = set(
+                Enrollment.objects.filter(student=request.user, course_id__in=course_ids)
+                .values_list('course_id', flat=True)
+            )
+        else:
+            self.enrolled = set()
+
+    def get_instructor(self, row):
+        if row['instructor_id'] is None:
+            return None
+        # Mirrors InstructorSerializer, `name` being User.get_full_name().
+        name = '%s %s' % (row['instructor__user__first_name'], row['instructor__user__last_name'])
+        return {
+            'id': row['instructor_id'],
+            'name': name.strip(),
+            'username': row['instructor__user__username'],
+            'bio': row['instructor__bio'],
+        }
+
+    def get_is_enrolled(self, row):
+        return row['id'] in self.enrolled
+
+    def get_lessons(self, row):
+        return self.lessons.get(row['id'], [])
+
+
+class SyncCourseValuesSerializer(CourseValuesSerializer):
+    serializer_class = SyncCourseSerializer
+    computed_fields = ('instructor',)
+
+    def prepare(self, queryset, rows):
+        pass
+
+
+class SyncLessonValuesSerializer(ValuesSerializer):
+    serializer_class = SyncLessonSerializer
+
+
+class EnrollmentValuesSerializer(ValuesSerializer):
+    serializer_class = EnrollmentSerializer
+    computed_fields = ('course',)
+    extra_values = ('course_id',)
+
+    def prepare(self, queryset, rows):
+        # Ids from the rows rather than a subquery: archived enrollments may
+        # live in another database than Course.
+        courses = Course.objects.filter(pk__in={row['course_id'] for row in rows})
+        course_data = CourseValuesSerializer(self.context).to_representation(courses)
+        self.courses = {course['id']: course for course in course_data}
+
+    def get_course(self, row):
+        return self.courses[row['course_id']]
@@ -1,9 +1,7 @@
-from django.shortcuts import render
-
 # Create your views here.
 from rest_framework import viewsets, permissions, status
-from .models import Course, Enrollment, Grade, Lesson
-from .serializers import CourseSerializer, EnrollmentSerializer, CourseWithEnrollmentsSerializer, GradeSerializer, LessonSerializer, InstructorDashboardSerializer
+from .models import ArchivedEnrollment, ArchivedGrade, Course, Enrollment, Grade, Lesson, Job, RelatedCourse
+from .serializers import CourseSerializer, EnrollmentSerializer, CourseWithEnrollmentsSerializer, GradeSerializer, LessonSerializer, EnrollmentStatusQuerySerializer, InstructorDashboardSerializer, JobSerializer, RelatedCourseSerializer, RolloverSerializer
 from rest_framework.decorators import (
     action, 
     api_view, 
@@ -11,18 +9,35 @@ from rest_framework.decorators import (
     authentication_classes
 )
 from rest_framework.response import Response
+from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from .permissions import IsInstructor, IsInstructorOrReadOnly
-from django.db.models import Count
+from .mixins import ValuesListMixin
+from .values_serializers import (
+    CourseValuesSerializer,
+    EnrollmentValuesSerializer,
+    GradeValuesSerializer,
+    JobValuesSerializer,
+    LessonValuesSerializer,
+)
+from .archive import include_archived
+from .rollover import DateOutOfRange, rollover as rollover_courses, shift_to_start
+from .sync import InvalidCursor, changes_since
+from . import jobs
+from .throttling import IPThrottle, UserThrottle
+from django.db.models import Count, Exists, OuterRef, prefetch_related_objects
 from datetime import datetime, timedelta
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    values_serializer_class = CourseValuesSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsInstructorOrReadOnly]
+    # Set per action; see `enroll`.
+    throttle_scope = None
 
     def perform_create(self, serializer):
         serializer.save(instructor=self.request.user.instructor)
@@ -30,10 +45,23 @@ class CourseViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def enrollments(self, request, pk=None):
         course = self.get_object()
+        # Every enrollment nests its course again; share one set of lessons.
+        prefetch_related_objects([course], 'instructor__user', 'lessons', 'enrollments')
         serializer = CourseWithEnrollmentsSerializer(course)
         return Response(serializer.data)
 
-    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """
+        "Students also took": the courses most often taken together with this
+        one, best first, as precomputed by courses.recommendations.
+        """
+        course = self.get_object()
+        related = RelatedCourse.objects.filter(course=course).select_related('related')
+        return Response(RelatedCourseSerializer(related, many=True).data)
+
+    @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated],
+            throttle_classes=[UserThrottle, IPThrottle], throttle_scope='enroll')
     def enroll(self, request, pk=None):
         course = self.get_object()
         enrollment, created = Enrollment.objects.get_or_create(student=request.user, course=course)
@@ -44,27 +72,42 @@ class CourseViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def enrollment_status(self, request, pk=None):
-        print(f"Checking enrollment status - Course ID: {pk}")
-        print(f"User making request: {request.user.username}")
-        print(f"User object attributes: {dir(request.user)}")
-        
+        """
+        Whether the user is enrolled in this course.
+        """
         course = self.get_object()
-        print(f"Found course: {course.title}")
-        
         is_enrolled = Enrollment.objects.filter(
             student=request.user,
             course=course
         ).exists()
-        print(f"Is enrolled: {is_enrolled}")
-        
-        response_data = {
+        return Response({
             'is_enrolled': is_enrolled,
             'course_id': course.id,
             'student_id': request.user.id
-        }
-        print(f"Sending response: {response_data}")
-        
-        return Response(response_data)
+        })
+
+    @action(detail=False, methods=['get'], url_path='enrollment_status',
+            permission_classes=[permissions.IsAuthenticated])
+    def bulk_enrollment_status(self, request):
+        """
+        `enrollment_status` for every course in `?ids=1,2,3`, in one query.
+        Ids of courses that don't exist are left out.
+        """
+        query = EnrollmentStatusQuerySerializer(
+            data={'ids': [pk for pk in request.query_params.get('ids', '').split(',') if pk]})
+        query.is_valid(raise_exception=True)
+        course_ids = set(query.validated_data['ids'])
+        enrolled = Enrollment.objects.filter(student=request.user, course=OuterRef('pk'))
+        courses = (Course.objects
+            .filter(pk__in=course_ids)
+            .annotate(is_enrolled=Exists(enrolled))
+            .order_by('pk')
+            .values_list('pk', 'is_enrolled'))
+        return Response([{
+            'is_enrolled': is_enrolled,
+            'course_id': course_id,
+            'student_id': request.user.id
+        } for course_id, is_enrolled in courses])
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def unenroll(self, request, pk=None):
@@ -94,7 +137,15 @@ class CourseViewSet(viewsets.ModelViewSet):
         if course.instructor != request.user.instructor:
             raise PermissionDenied("You can only view enrollments for your own courses")
         
-        enrollments = course.enrollments.select_related('student').all()
+        enrollments = list(course.enrollments.select_related('student').all())
+        if include_archived(request):
+            archived = list(ArchivedEnrollment.objects.filter(course_id=course.pk).order_by('pk'))
+            # The archive may be in another database, so users are loaded apart.
+            students = User.objects.in_bulk({enrollment.student_id for enrollment in archived})
+            for enrollment in archived:
+                if enrollment.student_id in students:
+                    enrollment.student = students[enrollment.student_id]
+                    enrollments.append(enrollment)
         
         return Response({
             'enrollments': [{
@@ -121,19 +172,60 @@ class CourseViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You can only view lessons for your own courses")
         
         lessons = course.lessons.all().order_by('order')
-        serializer = LessonSerializer(lessons, many=True)
         
         return Response({
             'course_id': course.id,
             'course_title': course.title,
-            'lessons': serializer.data
+            'lessons': LessonValuesSerializer().to_representation(lessons)
         })
 
+    @action(detail=True, methods=['post'], permission_classes=[IsInstructor])
+    def export_roster(self, request, pk=None):
+        """
+        Queue a roster export for a course owned by the instructor. Poll the
+        returned job for the result.
+        """
+        course = self.get_object()
+        if course.instructor != request.user.instructor:
+            raise PermissionDenied("You can only export rosters for your own courses")
+
+        # By name: the task modules are for workers and stay out of web processes.
+        job = jobs.enqueue('export_course_roster', {'course_id': course.id}, owner=request.user)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsInstructor])
+    def rollover(self, request):
+        """
+        Copy the instructor's courses listed in `course_ids`, with all their
+        lessons, into a new term. See RolloverSerializer for the date options.
+        """
+        serializer = RolloverSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        course_ids = set(serializer.validated_data['course_ids'])
+        courses = Course.objects.filter(pk__in=course_ids, instructor=request.user.instructor)
+        if courses.count() != len(course_ids):
+            raise PermissionDenied("You can only roll over your own courses")
+
+        # Report an out-of-range result under whichever option asked for it.
+        field = 'start_date' if 'start_date' in serializer.validated_data else 'shift_days'
+        if field == 'start_date':
+            shift = shift_to_start(courses, serializer.validated_data['start_date'])
+        else:
+            shift = serializer.validated_data['shift_days']
+        try:
+            mapping, lesson_count = rollover_courses(courses, shift)
+        except DateOutOfRange as exc:
+            raise ValidationError({field: str(exc)})
+        return Response({
+            'courses': [{'source_id': source, 'id': copy} for source, copy in mapping.items()],
+            'lessons_copied': lesson_count,
+        }, status=status.HTTP_201_CREATED)
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         return context  # This already includes the request by default in DRF
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing course enrollments.
     
@@ -146,6 +238,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     """
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
+    values_serializer_class = EnrollmentValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
@@ -155,9 +248,21 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Enrollment.objects.filter(student=self.request.user)
 
-class GradeViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        """
+        The user's enrollments; `?include_archived=1` adds those in courses
+        that have been archived.
+        """
+        response = super().list(request, *args, **kwargs)
+        if include_archived(request):
+            archived = ArchivedEnrollment.objects.filter(student_id=request.user.pk).order_by('pk')
+            response.data += self.values_serializer_class(self.get_serializer_context()).to_representation(archived)
+        return response
+
+class GradeViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
+    values_serializer_class = GradeValuesSerializer
     permission_classes = [permissions.IsAuthenticated, IsInstructor]
 
     def perform_create(self, serializer):
@@ -175,6 +280,25 @@ class GradeViewSet(viewsets.ModelViewSet):
             # Students can only see their own grades
             return Grade.objects.filter(enrollment__student=self.request.user)
 
+    def get_archived_queryset(self):
+        # No joins to Course: the archive may be in another database.
+        if hasattr(self.request.user, 'instructor'):
+            course_ids = list(Course.objects
+                .filter(instructor=self.request.user.instructor)
+                .values_list('pk', flat=True))
+            return ArchivedGrade.objects.filter(enrollment__course_id__in=course_ids)
+        return ArchivedGrade.objects.filter(enrollment__student_id=self.request.user.pk)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Grades visible to the user; `?include_archived=1` adds archived ones.
+        """
+        response = super().list(request, *args, **kwargs)
+        if include_archived(request):
+            archived = self.get_archived_queryset().order_by('pk')
+            response.data += self.values_serializer_class(self.get_serializer_context()).to_representation(archived)
+        return response
+
 class LessonViewSet(viewsets.ModelViewSet):
     serializer_class = LessonSerializer
     # Option 1: Allow any access (for testing)
@@ -190,26 +314,109 @@ class LessonViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You can only add lessons to your own courses")
         serializer.save(course=course)
 
+class JobViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Status of background jobs started by the authenticated user.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    values_serializer_class = JobValuesSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(owner=self.request.user).order_by('-created_at')
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def student_transcript(request):
+    """
+    Grade summary of every course the authenticated user is enrolled in,
+    read from the running aggregates on each enrollment. With
+    `?include_archived=1`, archived enrollments come first.
+    """
+    columns = ('id', 'course_id', 'enrollment_date', 'grade_count', 'grade_sum',
+               'grade_sum_squares', 'grade_min', 'grade_max', 'latest_grade')
+    enrollments = list(Enrollment.objects
+        .filter(student=request.user)
+        .order_by('course__start_date', 'course_id')
+        .values(*columns, 'course__title'))
+    for row in enrollments:
+        row['archived'] = False
+
+    if include_archived(request):
+        archived = list(ArchivedEnrollment.objects
+            .filter(student_id=request.user.pk)
+            .order_by('course_id')
+            .values(*columns))
+        titles = dict(Course.objects
+            .filter(pk__in={row['course_id'] for row in archived})
+            .values_list('pk', 'title'))
+        for row in archived:
+            row['course__title'] = titles.get(row['course_id'])
+            row['archived'] = True
+        enrollments = archived + enrollments
+
+    total_count = 0
+    total_sum = 0.0
+    courses = []
+    for row in enrollments:
+        count = row['grade_count']
+        total_count += count
+        total_sum += row['grade_sum']
+        mean = row['grade_sum'] / count if count else None
+        courses.append({
+            'enrollment_id': row['id'],
+            'course': {'id': row['course_id'], 'title': row['course__title']},
+            'enrollment_date': row['enrollment_date'],
+            'archived': row['archived'],
+            'grade_count': count,
+            'mean': mean,
+            'min': row['grade_min'],
+            'max': row['grade_max'],
+            'latest': row['latest_grade'],
+            # Population standard deviation; clamp float error below zero.
+            'std_dev': max(row['grade_sum_squares'] / count - mean * mean, 0) ** 0.5 if count else None,
+        })
+
+    return Response({
+        'enrollments': courses,
+        'overall': {
+            'grade_count': total_count,
+            # Every grade weighs the same, so courses with more grades weigh more.
+            'weighted_average': total_sum / total_count if total_count else None,
+        },
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@authentication_classes([JWTAuthentication])
+def sync_catalog(request):
+    """
+    Courses and lessons changed, and ids of those deleted, since the cursor
+    passed as `since`. Without `since` (or with one too old to catch up
+    from) the whole catalog is sent with `reset: true`. Keep requesting with
+    the returned cursor while `has_more` is true.
+    """
+    try:
+        changes = changes_since(request.query_params.get('since'), context={'request': request})
+    except InvalidCursor as exc:
+        raise ValidationError({'since': [str(exc)]})
+    return Response(changes)
+
 @api_view(['GET'])
 @permission_classes([IsInstructor])
 @authentication_classes([JWTAuthentication])
 def instructor_dashboard(request):
-    # Debug prints
-    print("Headers:", dict(request.headers))
-    print("User:", request.user)
-    print("Is authenticated:", request.user.is_authenticated)
-    print("Is instructor:", hasattr(request.user, 'instructor'))
-    
     """
     Get overview statistics for instructor's courses
     """
     instructor = request.user.instructor
-    courses = Course.objects.filter(instructor=instructor)
+    courses = list(InstructorDashboardSerializer.prefetch(Course.objects.filter(instructor=instructor)))
     
     # Get basic stats
-    total_courses = courses.count()
-    total_students = Enrollment.objects.filter(course__instructor=instructor).count()
-    total_lessons = Lesson.objects.filter(course__instructor=instructor).count()
+    total_courses = len(courses)
+    total_students = sum(course.student_count for course in courses)
+    total_lessons = sum(course.lesson_count for course in courses)
     
     # Get recent enrollments across all courses
     recent_enrollments = (Enrollment.objects
@@ -254,32 +461,30 @@ def instructor_dashboard(request):
 @permission_classes([IsInstructor])
 @authentication_classes([JWTAuthentication])
 def course_details(request, course_id):
-    # Debug prints
-    print("Headers:", dict(request.headers))
-    print("User:", request.user)
-    print("Is authenticated:", request.user.is_authenticated)
-    print("Is instructor:", hasattr(request.user, 'instructor'))
-    
     """
     Get detailed statistics for a specific course
     """
     instructor = request.user.instructor
-    course = get_object_or_404(Course, id=course_id, instructor=instructor)
+    course = get_object_or_404(
+        Course.objects.select_related('instructor__user').prefetch_related('lessons'),
+        id=course_id, instructor=instructor,
+    )
     
-    enrollments = course.enrollments.select_related('student')
+    enrollments = list(course.enrollments.select_related('student'))
     lessons = course.lessons.all()
     
     return Response({
         'course': CourseSerializer(course).data,
         'statistics': {
-            'total_students': enrollments.count(),
-            'total_lessons': lessons.count(),
+            'total_students': len(enrollments),
+            'total_lessons': len(lessons),
             'students': [{
                 'id': enrollment.student.id,
                 'name': enrollment.student.get_full_name() or enrollment.student.username,
                 'enrollment_date': enrollment.enrollment_date,
             } for enrollment in enrollments],
             'lessons': LessonSerializer(lessons, many=True).data,
-            'enrollment_rate': enrollments.count() / Course.objects.all().count() if Course.objects.exists() else 0,
+            # The course itself is counted, so this never divides by zero.
+            'enrollment_rate': len(enrollments) / Course.objects.count(),
         }
     })